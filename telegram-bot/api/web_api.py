@@ -1,15 +1,18 @@
+import asyncio
+import json
 import logging
-from typing import Union
+from typing import Iterator, Optional, Union
 
-from fastapi import Body, FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse
 from pathlib import Path
 
-from db.database import init_db
+from db.database import close_db, init_db
 from models import (
     Config,
     Group,
+    LeaseRequest,
     Stats,
     TaskAddExecutors,
     TaskCreate,
@@ -19,6 +22,7 @@ from models import (
 )
 from repositories.config_repository import ConfigRepository
 from repositories.groups_repository import GroupsRepository
+from repositories.leases_repository import LeasesRepository
 from repositories.stats_repository import StatsRepository
 from repositories.tasks_repository import TasksRepository
 from repositories.users_repository import UsersRepository
@@ -42,17 +46,61 @@ users_repo = UsersRepository()
 groups_repo = GroupsRepository()
 config_repo = ConfigRepository()
 stats_repo = StatsRepository()
+leases_repo = LeasesRepository()
 
 
+# Endpoints that touch sqlite are plain ``def`` on purpose: FastAPI runs them in
+# its thread pool, so blocking database calls never stall the event loop.
+# Keep them that way rather than turning them into ``async def``.
 @app.on_event("startup")
-def startup_event() -> None:
-    init_db()
-
-
-@app.get("/api/tasks")
-def get_tasks() -> dict:
-    tasks = tasks_repo.get_all_tasks()
-    return {"tasks": tasks}
+async def startup_event() -> None:
+    await asyncio.to_thread(init_db)
+
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    await asyncio.to_thread(close_db)
+
+
+def _stream_tasks(tasks: Iterator[dict], total: int) -> Iterator[bytes]:
+    """Encode {"tasks": [...], "total": N} one task at a time."""
+    yield b'{"tasks": ['
+    separator = b""
+    for task in tasks:
+        yield separator + json.dumps(task, ensure_ascii=False).encode()
+        separator = b", "
+    yield f'], "total": {total}}}'.encode()
+
+
+@app.get("/api/tasks", response_model=None)
+def get_tasks(
+    assigned_to: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1),
+    offset: int = Query(0, ge=0),
+    filter_key: Optional[str] = Query(None, alias="filter"),
+    group_id: Optional[str] = None,
+) -> Union[dict, StreamingResponse]:
+    total = tasks_repo.count_tasks(
+        assigned_to=assigned_to, status=status, filter_key=filter_key, group_id=group_id
+    )
+    if limit is None and offset == 0:
+        # The full list can be large: stream rows straight from the cursor
+        # instead of materialising them. Starlette runs this sync generator in
+        # its thread pool, like the sync endpoints.
+        tasks = tasks_repo.iter_all_tasks(
+            assigned_to=assigned_to, status=status, filter_key=filter_key, group_id=group_id
+        )
+        return StreamingResponse(_stream_tasks(tasks, total), media_type="application/json")
+    tasks = tasks_repo.get_all_tasks(
+        assigned_to=assigned_to,
+        status=status,
+        limit=limit,
+        offset=offset,
+        filter_key=filter_key,
+        group_id=group_id,
+    )
+    return {"tasks": tasks, "total": total}
 
 
 @app.post("/api/tasks")
@@ -157,6 +205,19 @@ def get_stats() -> dict:
     return stats.model_dump()
 
 
+# Polling leases keep two bot processes with the same token from both calling
+# getUpdates. Clients pass a hash of the token as lease_key, never the token.
+@app.post("/api/leases/{lease_key}")
+def acquire_lease(lease_key: str, lease: LeaseRequest) -> dict:
+    return {"acquired": leases_repo.acquire(lease_key, lease.holder, lease.ttl)}
+
+
+@app.delete("/api/leases/{lease_key}")
+def release_lease(lease_key: str, holder: str) -> dict:
+    leases_repo.release(lease_key, holder)
+    return {"success": True}
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,23 +1,45 @@
 import asyncio
 import datetime
-import json
+import functools
+import hashlib
+import itertools
 import logging
 import os
+import socket
+import time
 from collections import defaultdict
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlencode
 
 import httpx
-from aiogram import Bot, Dispatcher, Router, types
+import orjson
+from aiogram import BaseMiddleware, Bot, Dispatcher, Router, types
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.filters import Command
 from aiogram import F
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
 
 BASE_API_URL = "http://localhost:8000"
 TASKS_PER_PAGE = 5
+# Seconds a GET response from the API may be served from memory.
+API_CACHE_TTL = 5.0
+# Connection pool of the shared API client; raise these if handlers hit pool timeouts.
+HTTPX_MAX_CONNECTIONS = int(os.getenv("HTTPX_MAX_CONNECTIONS", "64"))
+HTTPX_MAX_KEEPALIVE = int(os.getenv("HTTPX_MAX_KEEPALIVE", "32"))
+# Upper bound on concurrent outgoing card messages (Telegram allows ~30 msg/s per bot).
+SEND_CONCURRENCY = 20
+# Bot-wide pacing of outgoing messages and edits, and the number of edit workers.
+SEND_RATE_PER_SEC = 30
+EDIT_WORKERS = 4
+# Only one process may poll a given token; it holds a lease in the API and renews it.
+POLL_LEASE_TTL = 60
+POLL_LEASE_RENEW_EVERY = 20
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
@@ -26,27 +48,136 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 router = Router()
-# Global dispatcher so helpers can access FSM without relying on deprecated
-# Dispatcher.get_current().
-dp = Dispatcher()
+
+
+def _make_fsm_storage() -> BaseStorage:
+    """Use Redis for FSM data when REDIS_URL is set so several bot processes share it."""
+    redis_url = os.getenv("REDIS_URL")
+    if not redis_url:
+        return MemoryStorage()
+    from aiogram.fsm.storage.redis import RedisStorage
+
+    return RedisStorage.from_url(redis_url)
+
+
+# Module-level dispatcher so the startup/shutdown hooks below can register on it.
+dp = Dispatcher(storage=_make_fsm_storage())
 dp.include_router(router)
 
+# Strong references to fire-and-forget tasks so they are not garbage-collected
+# before they finish.
+_background_tasks: Set[asyncio.Task] = set()
 
-class MessageCallbackAdapter:
-    def __init__(self, message: types.Message, data: str):
-        self.message = message
-        self.from_user = message.from_user
-        self.data = data
 
-    async def answer(self, text: str = "", show_alert: bool = False) -> None:  # noqa: ARG002
-        if text:
-            await self.message.answer(text)
+def _spawn(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def _answer_quietly(callback: types.CallbackQuery) -> None:
+    try:
+        await callback.answer()
+    except Exception as exc:
+        logger.warning("Failed to answer callback: %s", exc)
+
+
+def _ack(callback: types.CallbackQuery) -> None:
+    """Acknowledge a callback in the background; the ACK carries no payload."""
+    _spawn(_answer_quietly(callback))
+
+
+class RateLimiter:
+    """Token bucket: at most ``rate`` acquisitions per second, bursting up to ``rate``."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = rate
+        self._tokens = rate
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+_send_limiter = RateLimiter(SEND_RATE_PER_SEC)
+_send_semaphore = asyncio.Semaphore(SEND_CONCURRENCY)
+
+
+async def send_cards(
+    message: types.Message, cards: List[Tuple[str, Optional[InlineKeyboardMarkup]]]
+) -> None:
+    async def _send(text: str, keyboard: Optional[InlineKeyboardMarkup]) -> None:
+        async with _send_semaphore:
+            await _send_limiter.acquire()
+            await message.answer(text, reply_markup=keyboard)
+
+    await asyncio.gather(*(_send(text, keyboard) for text, keyboard in cards))
+
+
+# Pending edits keyed by (chat_id, message_id). A newer edit of the same
+# message replaces the queued one, so only the latest state is sent. A key is
+# never sent by two workers at once: while its edit is in flight, a newer job
+# waits in _edit_jobs and is queued again once that send finishes.
+_EditJob = Tuple[types.Message, str, Optional[InlineKeyboardMarkup], "asyncio.Future[None]"]
+_edit_jobs: Dict[Tuple[int, int], _EditJob] = {}
+_edit_inflight: Set[Tuple[int, int]] = set()
+_edit_queue: "asyncio.Queue[Tuple[int, int]]" = asyncio.Queue()
+_edit_workers: List[asyncio.Task] = []
+
+
+async def enqueue_edit(
+    message: types.Message, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None
+) -> None:
+    """Edit message through the paced edit queue; returns once the edit is sent or superseded."""
+    key = (message.chat.id, message.message_id)
+    future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+    previous = _edit_jobs.get(key)
+    _edit_jobs[key] = (message, text, reply_markup, future)
+    if previous is None:
+        if key not in _edit_inflight:
+            _edit_queue.put_nowait(key)
+    elif not previous[3].done():
+        previous[3].set_result(None)
+    await future
+
+
+async def _edit_worker() -> None:
+    while True:
+        key = await _edit_queue.get()
+        job = _edit_jobs.pop(key, None)
+        if job is None:
+            continue
+        message, text, reply_markup, future = job
+        _edit_inflight.add(key)
+        try:
+            await _send_limiter.acquire()
+            await message.edit_text(text, reply_markup=reply_markup)
+        except Exception as exc:
+            if not future.done():
+                future.set_exception(exc)
+        else:
+            if not future.done():
+                future.set_result(None)
+        finally:
+            _edit_inflight.discard(key)
+            if key in _edit_jobs:
+                _edit_queue.put_nowait(key)
 
 
 class MessageCallbackAdapter:
-    def __init__(self, message: types.Message, data: str):
+    def __init__(self, message: types.Message, data: str, from_user: Optional[types.User] = None):
         self.message = message
-        self.from_user = message.from_user
+        self.from_user = from_user or message.from_user
         self.data = data
 
     async def answer(self, text: str = "", show_alert: bool = False) -> None:  # noqa: ARG002
@@ -95,50 +226,150 @@ def parse_env_list(var_name: str) -> List[str]:
     return [item.strip() for item in raw.split(",") if item.strip()]
 
 
+# Environment does not change while the process runs, so read it once.
+_ENV_ADMINS: List[str] = parse_env_list("ADMIN_USERNAMES")
+
+
 def with_defaults(data: Dict[str, object] | None) -> Dict[str, object]:
     merged = DEFAULT_CONFIG.copy()
     if data:
         merged.update(data)
     if not merged.get("admins"):
-        merged["admins"] = parse_env_list("ADMIN_USERNAMES")
+        merged["admins"] = list(_ENV_ADMINS)
     return merged
 
 
-config: Dict[str, object] = with_defaults(None)
+config: Dict[str, object] = {}
 users_cache: List[dict] = []
 groups_cache: List[dict] = []
+# Membership view of config["admins"]; the list form is only needed on the wire.
+_admin_set: Set[str] = set()
+
+
+def _apply_config(cfg: Dict[str, object]) -> Dict[str, object]:
+    """Replace the active config and rebuild the derived admin set."""
+    global config, _admin_set
+    config = cfg
+    _admin_set = set(cfg.get("admins", []))
+    return config
+
+
+_apply_config(with_defaults(None))
+# Shared keep-alive client for the task API, opened and closed with the dispatcher.
+_http: Optional[httpx.AsyncClient] = None
+# path -> (monotonic fetch time, prepared response)
+_cache: Dict[str, Tuple[float, Any]] = {}
+# key -> GET request currently in flight for it
+_inflight: Dict[str, "asyncio.Task[Any]"] = {}
+_JSON_HEADERS = {"content-type": "application/json"}
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize a request body with orjson instead of httpx's stdlib json encoder."""
+    return orjson.dumps(obj)
+
+
+async def _fetch_into_cache(
+    key: str, path: str, params: Optional[Dict[str, object]], prepare: Optional[Callable[[Any], Any]]
+) -> Any:
+    response = await _http.get(path, params=params)
+    response.raise_for_status()
+    data = orjson.loads(response.content)
+    if prepare is not None:
+        data = prepare(data)
+    # A write may have invalidated this key while the request was in flight.
+    if _inflight.get(key) is asyncio.current_task():
+        _cache[key] = (time.monotonic(), data)
+    return data
+
+
+async def cached_get(
+    path: str,
+    params: Optional[Dict[str, object]] = None,
+    prepare: Optional[Callable[[Any], Any]] = None,
+    ttl: float = API_CACHE_TTL,
+) -> Any:
+    key = f"{path}?{urlencode(sorted(params.items()))}" if params else path
+    cached = _cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < ttl:
+        return cached[1]
+    # Concurrent misses for the same key share one request.
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_fetch_into_cache(key, path, params, prepare))
+        _inflight[key] = task
+
+        def _done(finished: "asyncio.Future[Any]") -> None:
+            if _inflight.get(key) is finished:
+                del _inflight[key]
+
+        task.add_done_callback(_done)
+    return await asyncio.shield(task)
+
+
+def invalidate_cache(path: str) -> None:
+    for store in (_cache, _inflight):
+        for key in [k for k in store if k == path or k.startswith(f"{path}?")]:
+            del store[key]
 
 
 async def fetch_config_from_api() -> Dict[str, object]:
-    global config
+    while _pending_config_saves:
+        await asyncio.gather(*_pending_config_saves, return_exceptions=True)
+    generation = _config_generation
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.get("/api/config")
-            response.raise_for_status()
-            remote = response.json()
-            config = with_defaults(remote)
+        response = await _http.get("/api/config")
+        response.raise_for_status()
+        remote = orjson.loads(response.content)
+        if _config_generation != generation:
+            # A local change was made while fetching; it is newer than remote.
+            return config
+        return _apply_config(with_defaults(remote))
     except Exception as exc:
         logger.error("Failed to fetch config from API: %s", exc)
-        config = with_defaults(config)
-    return config
+        return _apply_config(with_defaults(config))
 
 
 async def save_config_to_api(cfg: Dict[str, object]) -> None:
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            await client.post("/api/config", json=cfg)
+        await _http.post("/api/config", content=_dumps(cfg), headers=_JSON_HEADERS)
     except Exception as exc:
         logger.error("Failed to persist config to API: %s", exc)
 
 
+# Serializes background saves so they reach the API in the order they were made.
+_config_save_lock = asyncio.Lock()
+# Saves spawned but not finished yet; a refetch waits for them so it never
+# reads back a config older than the local one.
+_pending_config_saves: Set[asyncio.Task] = set()
+_config_generation = 0
+
+
+async def _persist_config_bg(cfg: Dict[str, object]) -> None:
+    async with _config_save_lock:
+        await save_config_to_api(cfg)
+
+
+def persist_config(cfg: Dict[str, object]) -> None:
+    """Save a snapshot of cfg without making the handler wait for the API."""
+    global _config_generation
+    _config_generation += 1
+    task = _spawn(_persist_config_bg(dict(cfg)))
+    _pending_config_saves.add(task)
+    task.add_done_callback(_pending_config_saves.discard)
+
+
+def _prepare_users(data: dict) -> List[dict]:
+    users = data.get("users", [])
+    for user in users:
+        user["_norm_handle"] = normalize_handle(user.get("username") or "")
+    return users
+
+
 async def fetch_users_from_api() -> List[dict]:
     global users_cache
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.get("/api/users")
-            response.raise_for_status()
-            data = response.json()
-            users_cache = data.get("users", [])
+        users_cache = await cached_get("/api/users", prepare=_prepare_users)
     except Exception as exc:
         logger.error("Failed to fetch users from API: %s", exc)
         users_cache = []
@@ -148,11 +379,7 @@ async def fetch_users_from_api() -> List[dict]:
 async def fetch_groups_from_api() -> List[dict]:
     global groups_cache
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.get("/api/groups")
-            response.raise_for_status()
-            data = response.json()
-            groups_cache = data.get("groups", [])
+        groups_cache = await cached_get("/api/groups", prepare=lambda data: data.get("groups", []))
     except Exception as exc:
         logger.error("Failed to fetch groups from API: %s", exc)
         groups_cache = []
@@ -162,29 +389,92 @@ async def fetch_groups_from_api() -> List[dict]:
 async def sync_bot_state() -> None:
     await asyncio.gather(fetch_config_from_api(), fetch_users_from_api(), fetch_groups_from_api())
 
-async def sync_bot_state() -> None:
-    await asyncio.gather(fetch_config_from_api(), fetch_users_from_api(), fetch_groups_from_api())
 
 def is_private_chat(chat: types.Chat) -> bool:
     return chat.type == "private"
 
 
-def is_private_chat(chat: types.Chat) -> bool:
-    return chat.type == "private"
+def _prepare_tasks(data: dict) -> List[dict]:
+    tasks = data.get("tasks", [])
+    for task in tasks:
+        task["_norm_assigned"] = normalize_handle(task.get("assigned_to") or "")
+        task["_group_key"] = str(task.get("group_id", ""))
+        task["_deadline_date"] = deadline_to_date(task.get("deadline") or "")
+    return tasks
+
+
+@dataclass
+class TaskIndex:
+    """All tasks plus lookups by handle and group, built once per fetch."""
+
+    all: List[dict]
+    by_handle: Dict[str, List[dict]] = field(default_factory=dict)
+    by_group: Dict[str, List[dict]] = field(default_factory=dict)
+
+    @classmethod
+    def build(cls, tasks: List[dict]) -> "TaskIndex":
+        today = datetime.date.today()
+        by_handle: Dict[str, List[dict]] = defaultdict(list)
+        by_group: Dict[str, List[dict]] = defaultdict(list)
+        for task in tasks:
+            by_handle[task["_norm_assigned"]].append(task)
+            by_group[task["_group_key"]].append(task)
+            task["_overdue"] = is_overdue(task, today, task["_deadline_date"])
+        return cls(tasks, dict(by_handle), dict(by_group))
 
 
-async def get_all_tasks() -> List[dict]:
+def _prepare_task_index(data: dict) -> TaskIndex:
+    return TaskIndex.build(_prepare_tasks(data))
+
+
+async def get_task_index() -> TaskIndex:
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.get("/api/tasks")
-            response.raise_for_status()
-            data = response.json()
-            return data.get("tasks", [])
+        return await cached_get("/api/tasks", prepare=_prepare_task_index)
     except Exception as exc:
         logger.error("Failed to fetch tasks: %s", exc)
         raise RuntimeError("Не удалось получить задачи") from exc
 
 
+async def get_all_tasks(
+    *, assigned_to: Optional[str] = None, status: Optional[str] = None, limit: Optional[int] = None
+) -> List[dict]:
+    if assigned_to is None and status is None and limit is None:
+        # Same request as the index; share its cache entry.
+        return (await get_task_index()).all
+    params: Dict[str, object] = {}
+    if assigned_to is not None:
+        params["assigned_to"] = assigned_to
+    if status is not None:
+        params["status"] = status
+    if limit is not None:
+        params["limit"] = limit
+    try:
+        return await cached_get("/api/tasks", params=params, prepare=_prepare_tasks)
+    except Exception as exc:
+        logger.error("Failed to fetch tasks: %s", exc)
+        raise RuntimeError("Не удалось получить задачи") from exc
+
+
+def _prepare_tasks_page(data: dict) -> Tuple[List[dict], int]:
+    return _prepare_tasks(data), int(data.get("total", 0))
+
+
+async def get_tasks_page(
+    filter_key: str, page: int, group_id: Optional[str] = None
+) -> Tuple[List[dict], int]:
+    """Fetch one page of the admin task list, filtered on the server."""
+    params: Dict[str, object] = {"offset": page * TASKS_PER_PAGE, "limit": TASKS_PER_PAGE}
+    if filter_key != "all":
+        params["filter"] = filter_key
+    if group_id is not None:
+        params["group_id"] = group_id
+    try:
+        return await cached_get("/api/tasks", params=params, prepare=_prepare_tasks_page)
+    except Exception as exc:
+        logger.error("Failed to fetch tasks page: %s", exc)
+        raise RuntimeError("Не удалось получить задачи") from exc
+
+
 async def create_task_group_via_api(
     task_text: str,
     deadline: str,
@@ -200,10 +490,10 @@ async def create_task_group_via_api(
         "assigned_by": assigned_by,
     }
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.post("/api/tasks", json=payload)
-            response.raise_for_status()
-            return response.json()
+        response = await _http.post("/api/tasks", content=_dumps(payload), headers=_JSON_HEADERS)
+        response.raise_for_status()
+        invalidate_cache("/api/tasks")
+        return orjson.loads(response.content)
     except Exception as exc:
         logger.error("Failed to create task group: %s", exc)
         raise RuntimeError("Не удалось создать задачу") from exc
@@ -218,10 +508,10 @@ async def add_executors_via_api(
         "assigned_by": assigned_by,
     }
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.post("/api/tasks", json=payload)
-            response.raise_for_status()
-            return response.json()
+        response = await _http.post("/api/tasks", content=_dumps(payload), headers=_JSON_HEADERS)
+        response.raise_for_status()
+        invalidate_cache("/api/tasks")
+        return orjson.loads(response.content)
     except Exception as exc:
         logger.error("Failed to add executors: %s", exc)
         raise RuntimeError("Не удалось добавить исполнителей") from exc
@@ -230,10 +520,10 @@ async def add_executors_via_api(
 async def upsert_user_via_api(username: str, full_name: str, groups: List[str]) -> dict:
     payload = {"username": username, "full_name": full_name, "groups": groups}
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.post("/api/users", json=payload)
-            response.raise_for_status()
-            return response.json()
+        response = await _http.post("/api/users", content=_dumps(payload), headers=_JSON_HEADERS)
+        response.raise_for_status()
+        invalidate_cache("/api/users")
+        return orjson.loads(response.content)
     except Exception as exc:
         logger.error("Failed to upsert user %s: %s", username, exc)
         raise RuntimeError("Не удалось сохранить пользователя") from exc
@@ -241,11 +531,11 @@ async def upsert_user_via_api(username: str, full_name: str, groups: List[str])
 
 async def delete_user_via_api(username: str) -> None:
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.delete(f"/api/users/{username}")
-            if response.status_code == 404:
-                raise RuntimeError("Пользователь не найден")
-            response.raise_for_status()
+        response = await _http.delete(f"/api/users/{username}")
+        if response.status_code == 404:
+            raise RuntimeError("Пользователь не найден")
+        response.raise_for_status()
+        invalidate_cache("/api/users")
     except Exception as exc:
         logger.error("Failed to delete user %s: %s", username, exc)
         raise RuntimeError("Не удалось удалить пользователя") from exc
@@ -254,12 +544,12 @@ async def delete_user_via_api(username: str) -> None:
 async def update_task_status_via_api(task_id: int, status: str) -> dict:
     payload = {"status": status}
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.put(f"/api/tasks/{task_id}", json=payload)
-            if response.status_code == 404:
-                raise RuntimeError("Задача не найдена")
-            response.raise_for_status()
-            return response.json()
+        response = await _http.put(f"/api/tasks/{task_id}", content=_dumps(payload), headers=_JSON_HEADERS)
+        if response.status_code == 404:
+            raise RuntimeError("Задача не найдена")
+        response.raise_for_status()
+        invalidate_cache("/api/tasks")
+        return orjson.loads(response.content)
     except Exception as exc:
         logger.error("Failed to update status for task %s: %s", task_id, exc)
         raise RuntimeError("Не удалось обновить статус задачи") from exc
@@ -276,12 +566,12 @@ async def update_group_via_api(
     if group_id is not None:
         payload["group_id"] = group_id
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.put(f"/api/tasks/{task_id}", json=payload)
-            if response.status_code == 404:
-                raise RuntimeError("Группа задач не найдена")
-            response.raise_for_status()
-            return response.json()
+        response = await _http.put(f"/api/tasks/{task_id}", content=_dumps(payload), headers=_JSON_HEADERS)
+        if response.status_code == 404:
+            raise RuntimeError("Группа задач не найдена")
+        response.raise_for_status()
+        invalidate_cache("/api/tasks")
+        return orjson.loads(response.content)
     except Exception as exc:
         logger.error("Failed to update group for task %s: %s", task_id, exc)
         raise RuntimeError("Не удалось обновить группу задачи") from exc
@@ -289,17 +579,38 @@ async def update_group_via_api(
 
 async def delete_task_via_api(task_id: int) -> dict:
     try:
-        async with httpx.AsyncClient(base_url=BASE_API_URL, timeout=15.0) as client:
-            response = await client.delete(f"/api/tasks/{task_id}")
-            if response.status_code == 404:
-                raise RuntimeError("Задача не найдена")
-            response.raise_for_status()
-            return response.json()
+        response = await _http.delete(f"/api/tasks/{task_id}")
+        if response.status_code == 404:
+            raise RuntimeError("Задача не найдена")
+        response.raise_for_status()
+        invalidate_cache("/api/tasks")
+        return orjson.loads(response.content)
     except Exception as exc:
         logger.error("Failed to delete task %s: %s", task_id, exc)
         raise RuntimeError("Не удалось удалить задачу") from exc
 
 
+async def acquire_poll_lease_via_api(lease_key: str, holder: str) -> Optional[bool]:
+    """Take or renew the polling lease; None when the API could not be asked."""
+    payload = {"holder": holder, "ttl": POLL_LEASE_TTL}
+    try:
+        response = await _http.post(f"/api/leases/{lease_key}", content=_dumps(payload), headers=_JSON_HEADERS)
+        response.raise_for_status()
+        return bool(orjson.loads(response.content).get("acquired"))
+    except Exception as exc:
+        logger.warning("Failed to reach the API for the polling lease: %s", exc)
+        return None
+
+
+async def release_poll_lease_via_api(lease_key: str, holder: str) -> None:
+    try:
+        response = await _http.delete(f"/api/leases/{lease_key}", params={"holder": holder})
+        response.raise_for_status()
+    except Exception as exc:
+        logger.warning("Failed to release the polling lease: %s", exc)
+
+
+@functools.lru_cache(maxsize=1024)
 def normalize_handle(username: str) -> str:
     return username if username.startswith("@") else f"@{username}"
 
@@ -309,31 +620,55 @@ def parse_assignees(raw: str) -> List[str]:
     return [normalize_handle(user) for user in users]
 
 
+@functools.lru_cache(maxsize=4096)
 def deadline_to_date(deadline: str) -> Optional[datetime.date]:
     try:
+        # Fixed-width slicing: the API stores YYYY-MM-DD; DD.MM.YYYY is what
+        # admins type and what older databases still hold.
+        if len(deadline) == 10 and deadline[2] == "." and deadline[5] == ".":
+            return datetime.date(int(deadline[6:10]), int(deadline[3:5]), int(deadline[0:2]))
+        if len(deadline) >= 10 and deadline[4] == "-" and deadline[7] == "-":
+            return datetime.date(int(deadline[0:4]), int(deadline[5:7]), int(deadline[8:10]))
         return datetime.datetime.strptime(deadline, "%d.%m.%Y").date()
-    except Exception:
+    except (TypeError, ValueError):
         return None
 
 
-def is_overdue(task: dict) -> bool:
+def format_deadline(task: dict) -> str:
+    """Deadline as DD.MM.YYYY for display; unparseable values are shown as stored."""
+    deadline = task.get("deadline") or ""
+    date_val = task["_deadline_date"] if "_deadline_date" in task else deadline_to_date(deadline)
+    return date_val.strftime("%d.%m.%Y") if date_val else deadline
+
+
+def format_timestamp(value: str) -> str:
+    """ISO timestamp from the API as DD.MM.YYYY HH:MM:SS; other values are shown as stored."""
+    try:
+        return datetime.datetime.fromisoformat(value).strftime("%d.%m.%Y %H:%M:%S")
+    except (TypeError, ValueError):
+        return value
+
+
+def is_overdue(
+    task: dict, today: Optional[datetime.date] = None, deadline_date: Optional[datetime.date] = None
+) -> bool:
     if task.get("status") == "completed":
         return False
-    date_val = deadline_to_date(task.get("deadline", ""))
+    date_val = deadline_date or deadline_to_date(task.get("deadline", ""))
     if not date_val:
         return False
-    return date_val < datetime.date.today()
+    return date_val < (today or datetime.date.today())
 
 
 def format_task_card(task: dict, include_completed_at: bool = False) -> str:
     lines = [
         f"#{task.get('id')} — {task.get('task_text', '')}",
-        f"Срок: {task.get('deadline', '')}",
+        f"Срок: {format_deadline(task)}",
         f"Назначил: {task.get('assigned_by', '')}",
         f"Статус: {task.get('status', '')}",
     ]
     if include_completed_at:
-        lines.append(f"Выполнено: {task.get('completed_at', '')}")
+        lines.append(f"Выполнено: {format_timestamp(task.get('completed_at', ''))}")
     return "\n".join(lines)
 
 
@@ -342,17 +677,33 @@ def format_task_line(task: dict) -> str:
     status_icon = "✅" if status == "completed" else "🟡"
     return (
         f"#{task.get('id')} {status_icon} {task.get('task_text', '')} "
-        f"(до {task.get('deadline', '')}) [group {task.get('group_task_id')}]")
+        f"(до {format_deadline(task)}) [group {task.get('group_task_id')}]")
 
 
-def user_is_admin(username: Optional[str]) -> bool:
-    if not username:
-        return False
-    handle = normalize_handle(username)
-    return handle in set(config.get("admins", []))
+class UserCtxMiddleware(BaseMiddleware):
+    """Resolve the sender's handle and admin flag once per update.
 
+    Handlers receive them as the ``handle`` and ``is_admin`` arguments.
+    """
 
-def main_menu_keyboard(is_admin: bool) -> ReplyKeyboardMarkup:
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any],
+    ) -> Any:
+        username = getattr(event.from_user, "username", None)
+        handle = normalize_handle(username) if username else None
+        data["handle"] = handle
+        data["is_admin"] = handle is not None and handle in _admin_set
+        return await handler(event, data)
+
+
+router.message.middleware(UserCtxMiddleware())
+router.callback_query.middleware(UserCtxMiddleware())
+
+
+def _build_main_menu_keyboard(is_admin: bool) -> ReplyKeyboardMarkup:
     buttons = [[KeyboardButton(text="📋 Мои задачи")]]
     if is_admin:
         buttons.append([KeyboardButton(text="👑 Админ панель")])
@@ -362,102 +713,201 @@ def main_menu_keyboard(is_admin: bool) -> ReplyKeyboardMarkup:
     )
 
 
+MAIN_MENU_ADMIN_KB = _build_main_menu_keyboard(is_admin=True)
+MAIN_MENU_USER_KB = _build_main_menu_keyboard(is_admin=False)
+
+MY_TASKS_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="🟡 Текущие задачи")],
+        [KeyboardButton(text="🟢 Выполненные задачи")],
+        [KeyboardButton(text="🏠 Главное меню")],
+    ],
+    resize_keyboard=True,
+    input_field_placeholder="Выберите список задач",
+)
+
+ADMIN_PANEL_KB = ReplyKeyboardMarkup(
+    keyboard=[
+        [KeyboardButton(text="➕ Новая задача"), KeyboardButton(text="📋 Все задачи")],
+        [KeyboardButton(text="❌ Просроченные"), KeyboardButton(text="👥 Задачи по сотрудникам")],
+        [KeyboardButton(text="🏘 Задачи по группам"), KeyboardButton(text="🛠 Управление задачами")],
+        [KeyboardButton(text="⚙️ Настройки уведомлений"), KeyboardButton(text="👤 Управление пользователями")],
+        [KeyboardButton(text="👑 Управление администраторами"), KeyboardButton(text="🏠 Главное меню")],
+    ],
+    resize_keyboard=True,
+    input_field_placeholder="Выберите действие администратора",
+)
+
+
+def main_menu_keyboard(is_admin: bool) -> ReplyKeyboardMarkup:
+    return MAIN_MENU_ADMIN_KB if is_admin else MAIN_MENU_USER_KB
+
+
 def my_tasks_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="🟡 Текущие задачи")],
-            [KeyboardButton(text="🟢 Выполненные задачи")],
-            [KeyboardButton(text="🏠 Главное меню")],
-        ],
-        resize_keyboard=True,
-        input_field_placeholder="Выберите список задач",
-    )
+    return MY_TASKS_KB
 
 
 def admin_panel_keyboard() -> ReplyKeyboardMarkup:
-    return ReplyKeyboardMarkup(
-        keyboard=[
-            [KeyboardButton(text="➕ Новая задача"), KeyboardButton(text="📋 Все задачи")],
-            [KeyboardButton(text="❌ Просроченные"), KeyboardButton(text="👥 Задачи по сотрудникам")],
-            [KeyboardButton(text="🏘 Задачи по группам"), KeyboardButton(text="🛠 Управление задачами")],
-            [KeyboardButton(text="⚙️ Настройки уведомлений"), KeyboardButton(text="👤 Управление пользователями")],
-            [KeyboardButton(text="👑 Управление администраторами"), KeyboardButton(text="🏠 Главное меню")],
-        ],
-        resize_keyboard=True,
-        input_field_placeholder="Выберите действие администратора",
-    )
+    return ADMIN_PANEL_KB
+
+
+CANCEL_CREATION_KB = InlineKeyboardMarkup(
+    inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data="exec:cancel")]]
+)
+
+DEADLINE_CHOICE_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="⏰ Сегодня", callback_data="deadline:today")],
+        [InlineKeyboardButton(text="⏰ Завтра", callback_data="deadline:tomorrow")],
+        [InlineKeyboardButton(text="⏰ Через 3 дня", callback_data="deadline:3days")],
+        [InlineKeyboardButton(text="⏰ Через неделю", callback_data="deadline:week")],
+        [InlineKeyboardButton(text="📅 Указать дату вручную", callback_data="deadline:custom")],
+        [InlineKeyboardButton(text="❌ Отмена", callback_data="exec:cancel")],
+    ]
+)
+
+
+FILTERS_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="🎯 Все задачи", callback_data="filter:all")],
+        [InlineKeyboardButton(text="🟡 Активные", callback_data="filter:active")],
+        [InlineKeyboardButton(text="🟢 Выполненные", callback_data="filter:completed")],
+        [InlineKeyboardButton(text="🔴 Просроченные", callback_data="filter:overdue")],
+        [InlineKeyboardButton(text="📅 Сегодня", callback_data="filter:today")],
+        [InlineKeyboardButton(text="📅 Завтра", callback_data="filter:tomorrow")],
+        [InlineKeyboardButton(text="📅 Эта неделя", callback_data="filter:week")],
+        [InlineKeyboardButton(text="📅 Этот месяц", callback_data="filter:month")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin:all")],
+        [InlineKeyboardButton(text="❌ Отмена", callback_data="admin:cancel")],
+    ]
+)
+
+
+MANAGE_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="✏️ Изменить текст задачи", callback_data="manage:edit_text")],
+        [InlineKeyboardButton(text="⏰ Изменить срок", callback_data="manage:deadline")],
+        [InlineKeyboardButton(text="👤 Переназначить исполнителя", callback_data="manage:reassign")],
+        [InlineKeyboardButton(text="🗑 Удалить задачу", callback_data="manage:delete")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="menu:admin")],
+    ]
+)
+
+
+USERS_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="➕ Добавить пользователя", callback_data="users:add")],
+        [InlineKeyboardButton(text="🗑 Удалить пользователя", callback_data="users:remove")],
+        [InlineKeyboardButton(text="📋 Список пользователей", callback_data="users:list")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="menu:admin")],
+    ]
+)
+
+
+ADMINS_KB = InlineKeyboardMarkup(
+    inline_keyboard=[
+        [InlineKeyboardButton(text="➕ Добавить администратора", callback_data="admins:add")],
+        [InlineKeyboardButton(text="🗑 Удалить администратора", callback_data="admins:remove")],
+        [InlineKeyboardButton(text="📋 Список администраторов", callback_data="admins:list")],
+        [InlineKeyboardButton(text="🔙 Назад", callback_data="menu:admin")],
+    ]
+)
+
+
+# Per-task buttons repeat on every card and list row, so their callback_data
+# uses short prefixes and one-letter action codes (Telegram caps it at 64 bytes).
+CB_TASK = "t"
+CB_ADMIN_TASK = "at"
+CB_SELECT = "s"
+CB_DEADLINE_UPDATE = "du"
+TASK_ACTION_CODES = {
+    "complete": "c",
+    "reopen": "r",
+    "deadline": "d",
+    "reassign": "a",
+    "delete": "x",
+    "edit_text": "e",
+}
+TASK_ACTIONS = {code: action for action, code in TASK_ACTION_CODES.items()}
+DEADLINE_CHOICE_CODES = {"today": "t", "tomorrow": "m", "3days": "3", "week": "w", "custom": "c"}
+DEADLINE_CHOICES = {code: choice for choice, code in DEADLINE_CHOICE_CODES.items()}
+DEADLINE_CHOICE_LABELS = (
+    ("t", "⏰ Сегодня"),
+    ("m", "⏰ Завтра"),
+    ("3", "⏰ Через 3 дня"),
+    ("w", "⏰ Через неделю"),
+    ("c", "📅 Указать дату"),
+)
+# Cards sent before the short codes still carry "task:complete:12" style data;
+# keep answering those buttons until old messages have aged out.
+LEGACY_CB_PREFIXES = {
+    CB_TASK: "task",
+    CB_ADMIN_TASK: "admin_task",
+    CB_SELECT: "select",
+    CB_DEADLINE_UPDATE: "deadline_update",
+}
+
+
+def cb_prefixes(prefix: str) -> Tuple[str, str]:
+    """Callback data prefixes a handler for prefix accepts: the short one and its legacy form."""
+    return f"{prefix}:", f"{LEGACY_CB_PREFIXES[prefix]}:"
+
+
+def task_cb(prefix: str, action: str, task_id: int) -> str:
+    return f"{prefix}:{TASK_ACTION_CODES[action]}:{task_id}"
+
+
+def parse_task_cb(data: str) -> Tuple[str, int]:
+    """Return (action, task_id) from a task_cb() string; action is "" if unknown."""
+    _, code, task_id_str = data.split(":", maxsplit=2)
+    # Legacy data spells the action out in full.
+    action = TASK_ACTIONS.get(code) or (code if code in TASK_ACTION_CODES else "")
+    return action, int(task_id_str)
+
+
+def parse_deadline_cb(data: str) -> Tuple[int, str]:
+    """Return (task_id, choice) from deadline-update data; choice is "" if unknown."""
+    _, task_id_str, code = data.split(":", maxsplit=2)
+    choice = DEADLINE_CHOICES.get(code) or (code if code in DEADLINE_CHOICE_CODES else "")
+    return int(task_id_str), choice
 
 
 def build_task_buttons(task: dict, for_completed: bool = False, for_user: bool = False) -> List[InlineKeyboardButton]:
     buttons: List[InlineKeyboardButton] = []
     if for_user:
         if for_completed:
-            buttons.append(InlineKeyboardButton(text="🔄 Открыть заново", callback_data=f"task:reopen:{task['id']}"))
-            buttons.append(InlineKeyboardButton(text="🗑 Удалить", callback_data=f"task:delete:{task['id']}"))
+            buttons.append(InlineKeyboardButton(text="🔄 Открыть заново", callback_data=task_cb(CB_TASK, "reopen", task["id"])))
+            buttons.append(InlineKeyboardButton(text="🗑 Удалить", callback_data=task_cb(CB_TASK, "delete", task["id"])))
         else:
-            buttons.append(InlineKeyboardButton(text="✅ Завершить", callback_data=f"task:complete:{task['id']}"))
+            buttons.append(InlineKeyboardButton(text="✅ Завершить", callback_data=task_cb(CB_TASK, "complete", task["id"])))
         return buttons
 
     if task.get("status") == "completed":
-        buttons.append(InlineKeyboardButton(text="🔄 Открыть заново", callback_data=f"admin_task:reopen:{task['id']}"))
-        buttons.append(InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin_task:delete:{task['id']}"))
+        buttons.append(InlineKeyboardButton(text="🔄 Открыть заново", callback_data=task_cb(CB_ADMIN_TASK, "reopen", task["id"])))
+        buttons.append(InlineKeyboardButton(text="🗑 Удалить", callback_data=task_cb(CB_ADMIN_TASK, "delete", task["id"])))
     else:
-        buttons.append(InlineKeyboardButton(text="✅ Завершить", callback_data=f"admin_task:complete:{task['id']}"))
-        buttons.append(InlineKeyboardButton(text="⏰ Изменить срок", callback_data=f"admin_task:deadline:{task['id']}"))
-        buttons.append(InlineKeyboardButton(text="👤 Переназначить", callback_data=f"admin_task:reassign:{task['id']}"))
-        buttons.append(InlineKeyboardButton(text="🗑 Удалить", callback_data=f"admin_task:delete:{task['id']}"))
+        buttons.append(InlineKeyboardButton(text="✅ Завершить", callback_data=task_cb(CB_ADMIN_TASK, "complete", task["id"])))
+        buttons.append(InlineKeyboardButton(text="⏰ Изменить срок", callback_data=task_cb(CB_ADMIN_TASK, "deadline", task["id"])))
+        buttons.append(InlineKeyboardButton(text="👤 Переназначить", callback_data=task_cb(CB_ADMIN_TASK, "reassign", task["id"])))
+        buttons.append(InlineKeyboardButton(text="🗑 Удалить", callback_data=task_cb(CB_ADMIN_TASK, "delete", task["id"])))
     return buttons
 
 
-def paginate_tasks(tasks: List[dict], page: int) -> Tuple[List[dict], bool, bool]:
-    start = page * TASKS_PER_PAGE
-    end = start + TASKS_PER_PAGE
-    sliced = tasks[start:end]
+def paginate_tasks(page: int, total: int) -> Tuple[bool, bool]:
     has_prev = page > 0
-    has_next = end < len(tasks)
-    return sliced, has_prev, has_next
-
-
-def task_matches_filter(task: dict, filter_key: str) -> bool:
-    today = datetime.date.today()
-    deadline_date = deadline_to_date(task.get("deadline", ""))
-    status = task.get("status")
-    if filter_key == "all":
-        return True
-    if filter_key == "active":
-        return status == "active"
-    if filter_key == "completed":
-        return status == "completed"
-    if filter_key == "overdue":
-        return is_overdue(task)
-    if not deadline_date:
-        return False
-    if filter_key == "today":
-        return deadline_date == today
-    if filter_key == "tomorrow":
-        return deadline_date == today + datetime.timedelta(days=1)
-    if filter_key == "week":
-        return today <= deadline_date <= today + datetime.timedelta(days=7)
-    if filter_key == "month":
-        return today <= deadline_date <= today + datetime.timedelta(days=30)
-    return True
-
+    has_next = (page + 1) * TASKS_PER_PAGE < total
+    return has_prev, has_next
 
-admin_views: Dict[int, Dict[str, object]] = defaultdict(lambda: {"filter": "all", "page": 0})
-selected_task_for_text: Dict[int, int] = {}
-selected_task_for_deadline: Dict[int, int] = {}
 
-
-async def show_main_menu(message: types.Message) -> None:
+async def show_main_menu(message: types.Message, handle: Optional[str], is_admin: bool) -> None:
     if not is_private_chat(message.chat):
         await message.answer("Главное меню доступно только в личном чате.")
         return
-    is_admin = user_is_admin(message.from_user.username)
     await message.answer("🏠 Главное меню", reply_markup=main_menu_keyboard(is_admin))
 
 
 @router.message(Command("start"))
-async def cmd_start(message: types.Message) -> None:
+async def cmd_start(message: types.Message, is_admin: bool) -> None:
     if not is_private_chat(message.chat):
         await message.answer("Используйте личный чат со мной, чтобы открыть меню.")
         return
@@ -465,116 +915,84 @@ async def cmd_start(message: types.Message) -> None:
         "Привет! Я помогаю управлять групповыми задачами.\n"
         "Используйте меню ниже."
     )
-    await message.answer(text, reply_markup=main_menu_keyboard(user_is_admin(message.from_user.username)))
+    await message.answer(text, reply_markup=main_menu_keyboard(is_admin))
 
 
-@router.message(lambda m: m.text == "📋 Мои задачи")
-async def menu_my_tasks(message: types.Message) -> None:
+async def menu_my_tasks(message: types.Message, handle: Optional[str], is_admin: bool) -> None:
     if not is_private_chat(message.chat):
         await message.answer("Меню доступно только в личном чате.")
         return
     await message.answer("📋 Мои задачи", reply_markup=my_tasks_keyboard())
 
 
-@router.message(lambda m: m.text == "👑 Админ панель")
-async def menu_admin_panel(message: types.Message) -> None:
+async def menu_admin_panel(message: types.Message, handle: Optional[str], is_admin: bool) -> None:
     if not is_private_chat(message.chat):
         await message.answer("Меню доступно только в личном чате.")
         return
-    if not user_is_admin(message.from_user.username):
+    if not is_admin:
         await message.answer("Недостаточно прав")
         return
     await message.answer("👑 Админ панель", reply_markup=admin_panel_keyboard())
 
 
-def make_callback_from_message(message: types.Message, data: str) -> MessageCallbackAdapter:
-    return MessageCallbackAdapter(message, data)
+def make_callback_from_message(
+    message: types.Message, data: str, from_user: Optional[types.User] = None
+) -> MessageCallbackAdapter:
+    return MessageCallbackAdapter(message, data, from_user)
+
 
+_ADMIN_ENTRY_MAP: Dict[str, str] = {
+    "➕ Новая задача": "admin:new",
+    "📋 Все задачи": "admin:all",
+    "❌ Просроченные": "admin:overdue",
+    "👥 Задачи по сотрудникам": "admin:by_user",
+    "🏘 Задачи по группам": "admin:by_group",
+    "🛠 Управление задачами": "admin:manage",
+    "⚙️ Настройки уведомлений": "admin:notify",
+    "👤 Управление пользователями": "admin:users",
+    "👑 Управление администраторами": "admin:admins",
+}
 
-async def handle_admin_entry(message: types.Message, data: str) -> None:
+
+async def handle_admin_entry(message: types.Message, data: str, state: FSMContext, is_admin: bool) -> None:
     if not is_private_chat(message.chat):
         await message.answer("Доступно только в личном чате.")
         return
-    if not user_is_admin(message.from_user.username):
+    if not is_admin:
         await message.answer("Недостаточно прав")
         return
     placeholder = await message.answer("Загружаю...")
-    callback = make_callback_from_message(placeholder, data)
-    dp = Dispatcher.get_current()
-    state = await dp.fsm.get_context(
-        bot=message.bot, chat_id=message.chat.id, user_id=message.from_user.id
-    )
-
-    handlers_map = {
-        "admin:new": cb_admin_new,
-        "admin:all": cb_admin_all,
-        "admin:overdue": cb_overdue,
-        "admin:by_user": cb_by_user,
-        "admin:by_group": cb_by_group,
-        "admin:manage": cb_manage_tasks,
-        "admin:notify": cb_notify_settings,
-        "admin:users": cb_user_management,
-        "admin:admins": cb_admins_management,
-    }
-
-    handler = handlers_map.get(data)
-    if handler is None:
-        await message.answer("Неизвестное действие")
-        return
+    # The placeholder is the bot's own message, so keep the real sender on the adapter.
+    callback = make_callback_from_message(placeholder, data, message.from_user)
 
     if data == "admin:new":
-        await handler(callback, state)
+        await cb_admin_new(callback, state, is_admin)
+    elif data == "admin:all":
+        await cb_admin_all(callback, state)
+    elif data == "admin:overdue":
+        await cb_overdue(callback, state)
     else:
+        handlers_map = {
+            "admin:by_user": cb_by_user,
+            "admin:by_group": cb_by_group,
+            "admin:manage": cb_manage,
+            "admin:notify": cb_notify,
+            "admin:users": cb_users,
+            "admin:admins": cb_admins,
+        }
+        handler = handlers_map.get(data)
+        if handler is None:
+            await message.answer("Неизвестное действие")
+            return
         await handler(callback)
 
 
-@router.message(F.text == "➕ Новая задача")
-async def msg_admin_new(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:new")
+@router.message(F.text.in_(set(_ADMIN_ENTRY_MAP)))
+async def msg_admin_entry(message: types.Message, state: FSMContext, is_admin: bool) -> None:
+    await handle_admin_entry(message, _ADMIN_ENTRY_MAP[message.text], state, is_admin)
 
 
-@router.message(F.text == "📋 Все задачи")
-async def msg_admin_all(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:all")
-
-
-@router.message(F.text == "❌ Просроченные")
-async def msg_admin_overdue(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:overdue")
-
-
-@router.message(F.text == "👥 Задачи по сотрудникам")
-async def msg_admin_by_user(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:by_user")
-
-
-@router.message(F.text == "🏘 Задачи по группам")
-async def msg_admin_by_group(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:by_group")
-
-
-@router.message(F.text == "🛠 Управление задачами")
-async def msg_admin_manage(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:manage")
-
-
-@router.message(F.text == "⚙️ Настройки уведомлений")
-async def msg_admin_notify(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:notify")
-
-
-@router.message(F.text == "👤 Управление пользователями")
-async def msg_admin_users(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:users")
-
-
-@router.message(F.text == "👑 Управление администраторами")
-async def msg_admin_admins(message: types.Message) -> None:
-    await handle_admin_entry(message, "admin:admins")
-
-
-@router.message(lambda m: m.text == "ℹ️ Помощь")
-async def menu_help(message: types.Message) -> None:
+async def menu_help(message: types.Message, handle: Optional[str], is_admin: bool) -> None:
     if not is_private_chat(message.chat):
         await message.answer("Меню доступно только в личном чате.")
         return
@@ -582,90 +1000,109 @@ async def menu_help(message: types.Message) -> None:
         "Нажимайте кнопки панели, чтобы открыть список задач или админ-панель.\n"
         "Для детальных действий используйте кнопки под сообщениями."
     )
-    await message.answer(help_text, reply_markup=main_menu_keyboard(user_is_admin(message.from_user.username)))
+    await message.answer(help_text, reply_markup=main_menu_keyboard(is_admin))
 
 
-@router.callback_query(lambda c: c.data == "menu:main")
-async def cb_menu_main(callback: types.CallbackQuery) -> None:
-    await callback.message.answer(
-        "🏠 Главное меню", reply_markup=main_menu_keyboard(user_is_admin(callback.from_user.username))
-    )
-    await callback.answer()
+@router.callback_query(F.data == "menu:main")
+async def cb_menu_main(callback: types.CallbackQuery, is_admin: bool) -> None:
+    await callback.message.answer("🏠 Главное меню", reply_markup=main_menu_keyboard(is_admin))
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data == "menu:mytasks")
+@router.callback_query(F.data == "menu:mytasks")
 async def cb_menu_mytasks(callback: types.CallbackQuery) -> None:
     await callback.message.answer("📋 Мои задачи", reply_markup=my_tasks_keyboard())
-    await callback.answer()
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data == "menu:admin")
-async def cb_menu_admin(callback: types.CallbackQuery) -> None:
-    if not user_is_admin(callback.from_user.username):
+@router.callback_query(F.data == "menu:admin")
+async def cb_menu_admin(callback: types.CallbackQuery, is_admin: bool) -> None:
+    if not is_admin:
         await callback.answer("Недостаточно прав", show_alert=True)
         return
-    await callback.message.edit_text("👑 Админ панель", reply_markup=admin_panel_keyboard())
-    await callback.answer()
+    await enqueue_edit(callback.message, "👑 Админ панель", reply_markup=admin_panel_keyboard())
+    _ack(callback)
 
 
-async def show_my_tasks_selection(message: types.Message, selection: str) -> None:
-    username = message.from_user.username if message.from_user else None
-    if not username:
+async def show_my_tasks_selection(message: types.Message, selection: str, handle: Optional[str]) -> None:
+    if not handle:
         await message.answer("Username не найден", reply_markup=my_tasks_keyboard())
         return
-    handle = normalize_handle(username)
+    if selection not in {"active", "completed"}:
+        return
     try:
-        tasks = await get_all_tasks()
+        tasks = await get_all_tasks(assigned_to=handle, status=selection)
     except RuntimeError as exc:
         await message.answer(str(exc), reply_markup=my_tasks_keyboard())
         return
 
     if selection == "active":
-        active_tasks = [t for t in tasks if t.get("assigned_to") == handle and t.get("status") == "active"]
+        active_tasks = tasks
         if not active_tasks:
             await message.answer("Нет активных задач", reply_markup=my_tasks_keyboard())
             return
-        for task in active_tasks:
-            buttons = InlineKeyboardMarkup(
-                inline_keyboard=[[btn for btn in build_task_buttons(task, for_user=True)]]
-            )
-            await message.answer(format_task_card(task), reply_markup=buttons)
+        await send_cards(
+            message,
+            [
+                (
+                    format_task_card(task),
+                    InlineKeyboardMarkup(inline_keyboard=[build_task_buttons(task, for_user=True)]),
+                )
+                for task in active_tasks
+            ],
+        )
         return
 
     if selection == "completed":
-        completed_tasks = [t for t in tasks if t.get("assigned_to") == handle and t.get("status") == "completed"]
-        completed_tasks = sorted(completed_tasks, key=lambda t: t.get("completed_at", ""), reverse=True)[:5]
+        completed_tasks = sorted(tasks, key=lambda t: t.get("completed_at", ""), reverse=True)[:5]
         if not completed_tasks:
             await message.answer("Нет выполненных задач", reply_markup=my_tasks_keyboard())
             return
-        for task in completed_tasks:
-            buttons = InlineKeyboardMarkup(
-                inline_keyboard=[[btn for btn in build_task_buttons(task, for_completed=True, for_user=True)]]
-            )
-            await message.answer(format_task_card(task, include_completed_at=True), reply_markup=buttons)
+        await send_cards(
+            message,
+            [
+                (
+                    format_task_card(task, include_completed_at=True),
+                    InlineKeyboardMarkup(inline_keyboard=[build_task_buttons(task, for_completed=True, for_user=True)]),
+                )
+                for task in completed_tasks
+            ],
+        )
 
 
-@router.message(F.text == "🟡 Текущие задачи")
-async def msg_my_active(message: types.Message) -> None:
-    await show_my_tasks_selection(message, "active")
+async def msg_my_active(message: types.Message, handle: Optional[str], is_admin: bool) -> None:
+    await show_my_tasks_selection(message, "active", handle)
 
 
-@router.message(F.text == "🟢 Выполненные задачи")
-async def msg_my_completed(message: types.Message) -> None:
-    await show_my_tasks_selection(message, "completed")
+async def msg_my_completed(message: types.Message, handle: Optional[str], is_admin: bool) -> None:
+    await show_my_tasks_selection(message, "completed", handle)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("my:"))
-async def cb_my_tasks(callback: types.CallbackQuery) -> None:
-    selection = callback.data.split(":")[1]
-    await show_my_tasks_selection(callback.message, selection)
-    await callback.answer()
+_MENU_HANDLERS: Dict[str, Callable[[types.Message, Optional[str], bool], Awaitable[None]]] = {
+    "📋 Мои задачи": menu_my_tasks,
+    "👑 Админ панель": menu_admin_panel,
+    "ℹ️ Помощь": menu_help,
+    "🏠 Главное меню": show_main_menu,
+    "🟡 Текущие задачи": msg_my_active,
+    "🟢 Выполненные задачи": msg_my_completed,
+}
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("task:"))
+@router.message(F.text.in_(set(_MENU_HANDLERS)))
+async def menu_dispatch(message: types.Message, handle: Optional[str], is_admin: bool) -> None:
+    await _MENU_HANDLERS[message.text](message, handle, is_admin)
+
+
+@router.callback_query(F.data.startswith("my:"))
+async def cb_my_tasks(callback: types.CallbackQuery, handle: Optional[str]) -> None:
+    _, _, selection = callback.data.partition(":")
+    await show_my_tasks_selection(callback.message, selection, handle)
+    _ack(callback)
+
+
+@router.callback_query(F.data.startswith(cb_prefixes(CB_TASK)))
 async def cb_task_actions(callback: types.CallbackQuery) -> None:
-    _, action, task_id_str = callback.data.split(":", maxsplit=2)
-    task_id = int(task_id_str)
+    action, task_id = parse_task_cb(callback.data)
     try:
         if action == "complete":
             await update_task_status_via_api(task_id, "completed")
@@ -683,27 +1120,18 @@ async def cb_task_actions(callback: types.CallbackQuery) -> None:
         await callback.answer(str(exc), show_alert=True)
         return
 
-    await callback.message.edit_text("Обновлено")
+    await enqueue_edit(callback.message, "Обновлено")
 
 
-async def send_task_cards(chat: types.Message, tasks: List[dict], show_buttons: bool = True) -> None:
-    for task in tasks:
-        buttons_block: List[List[InlineKeyboardButton]] = []
-        if show_buttons:
-            row = build_task_buttons(task, for_completed=task.get("status") == "completed")
-            while row:
-                buttons_block.append([row.pop(0)])
-        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons_block) if buttons_block else None
-        await chat.answer(format_task_line(task), reply_markup=keyboard)
-
-
-@router.callback_query(lambda c: c.data == "admin:new")
-async def cb_admin_new(callback: types.CallbackQuery, state: FSMContext) -> None:
-    if not user_is_admin(callback.from_user.username):
-        await callback.answer("Недостаточно прав", show_alert=True)
-        return
-    await state.clear()
-    await state.set_state(AdminCreateTask.choosing_executors)
+# Built from the users_cache list it was made for; a refresh replaces that
+# list object, which is what triggers a rebuild.
+_executors_kb: Optional[Tuple[List[dict], InlineKeyboardMarkup]] = None
+
+
+def executors_keyboard() -> InlineKeyboardMarkup:
+    global _executors_kb
+    if _executors_kb is not None and _executors_kb[0] is users_cache:
+        return _executors_kb[1]
     keyboard_rows: List[List[InlineKeyboardButton]] = []
     for idx, user in enumerate(users_cache):
         if idx % 2 == 0:
@@ -713,18 +1141,30 @@ async def cb_admin_new(callback: types.CallbackQuery, state: FSMContext) -> None
         )
     keyboard_rows.append([InlineKeyboardButton(text="✔️ Завершить выбор", callback_data="exec:done")])
     keyboard_rows.append([InlineKeyboardButton(text="❌ Отмена", callback_data="exec:cancel")])
-    await callback.message.edit_text("Выберите исполнителей", reply_markup=InlineKeyboardMarkup(inline_keyboard=keyboard_rows))
-    await callback.answer()
+    markup = InlineKeyboardMarkup(inline_keyboard=keyboard_rows)
+    _executors_kb = (users_cache, markup)
+    return markup
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("exec:"))
+@router.callback_query(F.data == "admin:new")
+async def cb_admin_new(callback: types.CallbackQuery, state: FSMContext, is_admin: bool) -> None:
+    if not is_admin:
+        await callback.answer("Недостаточно прав", show_alert=True)
+        return
+    await state.clear()
+    await state.set_state(AdminCreateTask.choosing_executors)
+    await enqueue_edit(callback.message, "Выберите исполнителей", reply_markup=executors_keyboard())
+    _ack(callback)
+
+
+@router.callback_query(F.data.startswith("exec:"))
 async def cb_exec_selection(callback: types.CallbackQuery, state: FSMContext) -> None:
-    data = callback.data.split(":")
+    data = callback.data.split(":", maxsplit=2)
     action = data[1]
     if action == "cancel":
         await state.clear()
-        await callback.message.edit_text("Создание задачи отменено", reply_markup=admin_panel_keyboard())
-        await callback.answer()
+        await enqueue_edit(callback.message, "Создание задачи отменено", reply_markup=admin_panel_keyboard())
+        _ack(callback)
         return
 
     context = await state.get_data()
@@ -746,9 +1186,8 @@ async def cb_exec_selection(callback: types.CallbackQuery, state: FSMContext) ->
             return
         await state.update_data(assignees=selected)
         await state.set_state(AdminCreateTask.task_text)
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data="exec:cancel")]])
-        await callback.message.edit_text("Введите описание задачи сообщением", reply_markup=keyboard)
-        await callback.answer()
+        await enqueue_edit(callback.message, "Введите описание задачи сообщением", reply_markup=CANCEL_CREATION_KB)
+        _ack(callback)
 
 
 @router.message(AdminCreateTask.task_text)
@@ -764,25 +1203,17 @@ async def admin_task_text(message: types.Message, state: FSMContext) -> None:
     await message.answer("Выберите группу/чат для уведомлений", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("group:"))
+@router.callback_query(F.data.startswith("group:choose:") | (F.data == "group:none"))
 async def cb_choose_group(callback: types.CallbackQuery, state: FSMContext) -> None:
-    parts = callback.data.split(":")
+    parts = callback.data.split(":", maxsplit=2)
     if parts[1] == "none":
         group_id = ""
     else:
         group_id = parts[2]
     await state.update_data(group_id=group_id)
     await state.set_state(AdminCreateTask.deadline)
-    rows = [
-        [InlineKeyboardButton(text="⏰ Сегодня", callback_data="deadline:today")],
-        [InlineKeyboardButton(text="⏰ Завтра", callback_data="deadline:tomorrow")],
-        [InlineKeyboardButton(text="⏰ Через 3 дня", callback_data="deadline:3days")],
-        [InlineKeyboardButton(text="⏰ Через неделю", callback_data="deadline:week")],
-        [InlineKeyboardButton(text="📅 Указать дату вручную", callback_data="deadline:custom")],
-        [InlineKeyboardButton(text="❌ Отмена", callback_data="exec:cancel")],
-    ]
-    await callback.message.edit_text("Выберите срок", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
-    await callback.answer()
+    await enqueue_edit(callback.message, "Выберите срок", reply_markup=DEADLINE_CHOICE_KB)
+    _ack(callback)
 
 
 def deadline_from_choice(choice: str) -> str:
@@ -798,22 +1229,23 @@ def deadline_from_choice(choice: str) -> str:
     return today.strftime("%d.%m.%Y")
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("deadline:"))
+@router.callback_query(F.data.startswith("deadline:"))
 async def cb_deadline_choice(callback: types.CallbackQuery, state: FSMContext) -> None:
-    _, choice = callback.data.split(":")
+    _, _, choice = callback.data.partition(":")
     if choice == "custom":
         await state.set_state(AdminCreateTask.custom_deadline)
-        await callback.message.edit_text(
+        await enqueue_edit(
+            callback.message,
             "Введите дату в формате ДД.ММ.ГГГГ",
-            reply_markup=InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="❌ Отмена", callback_data="exec:cancel")]]),
+            reply_markup=CANCEL_CREATION_KB,
         )
-        await callback.answer()
+        _ack(callback)
         return
 
     deadline_str = deadline_from_choice(choice)
     await state.update_data(deadline=deadline_str)
     await finalize_task_creation(callback.message, callback.from_user, state)
-    await callback.answer()
+    _ack(callback)
 
 
 @router.message(AdminCreateTask.custom_deadline)
@@ -848,16 +1280,39 @@ async def finalize_task_creation(message: types.Message, user: types.User, state
     )
 
 
-async def render_tasks_page(callback: types.CallbackQuery, tasks: List[dict]) -> None:
-    view = admin_views[callback.from_user.id]
-    filtered = [t for t in tasks if task_matches_filter(t, view.get("filter", "all"))]
-    page = int(view.get("page", 0))
-    page_tasks, has_prev, has_next = paginate_tasks(filtered, page)
+# Each render takes a fresh token from this process-wide counter. Reading,
+# bumping and writing back a counter in FSM data is not atomic under
+# RedisStorage, so two quick clicks could both claim the same value.
+_view_tokens = itertools.count(1)
+
+
+async def render_tasks_page(callback: types.CallbackQuery, state: FSMContext) -> None:
+    # The list view (filter, page, optional group) lives in FSM data so it
+    # survives restarts and is dropped together with the rest of the user's state.
+    data = await state.get_data()
+    filter_key = data.get("view_filter", "all")
+    page = int(data.get("view_page", 0))
+    group_id = data.get("view_group")
+    seq = next(_view_tokens)
+    await state.update_data(view_seq=seq)
+    try:
+        page_tasks, total = await get_tasks_page(filter_key, page, group_id)
+    except RuntimeError as exc:
+        await callback.answer(str(exc), show_alert=True)
+        return
+    if (await state.get_data()).get("view_seq") != seq:
+        # A newer click started its own render while this page was loading.
+        _ack(callback)
+        return
+    has_prev, has_next = paginate_tasks(page, total)
     if not page_tasks:
-        await callback.message.edit_text("Нет задач по выбранному фильтру", reply_markup=admin_panel_keyboard())
-        await callback.answer()
+        empty_text = "Просроченных задач нет" if filter_key == "overdue" else "Нет задач по выбранному фильтру"
+        await enqueue_edit(callback.message, empty_text, admin_panel_keyboard())
+        _ack(callback)
         return
-    text_lines = [f"Страница {page + 1}", f"Фильтр: {view.get('filter')}"]
+    text_lines = [f"Страница {page + 1}", f"Фильтр: {filter_key}"]
+    if group_id is not None:
+        text_lines.insert(0, f"Задачи группы {group_id}")
     for idx, task in enumerate(page_tasks, start=1 + page * TASKS_PER_PAGE):
         text_lines.append(f"{idx}. {format_task_line(task)}")
     nav_buttons: List[List[InlineKeyboardButton]] = []
@@ -871,220 +1326,182 @@ async def render_tasks_page(callback: types.CallbackQuery, tasks: List[dict]) ->
         nav_buttons.append([InlineKeyboardButton(text=f"# {task['id']}", callback_data="noop")])
         nav_buttons.append([InlineKeyboardButton(text=btn.text, callback_data=btn.callback_data) for btn in row_buttons])
     nav_buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="admin:cancel")])
-    await callback.message.edit_text("\n".join(text_lines), reply_markup=InlineKeyboardMarkup(inline_keyboard=nav_buttons))
-    await callback.answer()
+    await enqueue_edit(callback.message, "\n".join(text_lines), InlineKeyboardMarkup(inline_keyboard=nav_buttons))
+    await state.update_data(view_rendered=[callback.message.message_id, filter_key, page])
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data == "admin:all")
-async def cb_admin_all(callback: types.CallbackQuery) -> None:
-    try:
-        tasks = await get_all_tasks()
-    except RuntimeError as exc:
-        await callback.answer(str(exc), show_alert=True)
-        return
-    admin_views[callback.from_user.id] = {"filter": "all", "page": 0}
-    await render_tasks_page(callback, tasks)
+@router.callback_query(F.data == "admin:all")
+async def cb_admin_all(callback: types.CallbackQuery, state: FSMContext) -> None:
+    await state.update_data(view_filter="all", view_page=0, view_group=None, view_rendered=None)
+    await render_tasks_page(callback, state)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("admin_page:"))
-async def cb_admin_page(callback: types.CallbackQuery) -> None:
-    direction = callback.data.split(":")[1]
-    view = admin_views[callback.from_user.id]
-    page = int(view.get("page", 0))
+@router.callback_query(F.data.startswith("admin_page:"))
+async def cb_admin_page(callback: types.CallbackQuery, state: FSMContext) -> None:
+    _, _, direction = callback.data.partition(":")
+    data = await state.get_data()
+    page = int(data.get("view_page", 0))
     if direction == "next":
         page += 1
     elif direction == "prev" and page > 0:
         page -= 1
-    view["page"] = page
-    try:
-        tasks = await get_all_tasks()
-    except RuntimeError as exc:
-        await callback.answer(str(exc), show_alert=True)
-        return
-    await render_tasks_page(callback, tasks)
+    await state.update_data(view_page=page)
+    await render_tasks_page(callback, state)
 
 
-@router.callback_query(lambda c: c.data == "admin:filters")
-async def cb_admin_filters(callback: types.CallbackQuery) -> None:
-    rows = [
-        [InlineKeyboardButton(text="🎯 Все задачи", callback_data="filter:all")],
-        [InlineKeyboardButton(text="🟡 Активные", callback_data="filter:active")],
-        [InlineKeyboardButton(text="🟢 Выполненные", callback_data="filter:completed")],
-        [InlineKeyboardButton(text="🔴 Просроченные", callback_data="filter:overdue")],
-        [InlineKeyboardButton(text="📅 Сегодня", callback_data="filter:today")],
-        [InlineKeyboardButton(text="📅 Завтра", callback_data="filter:tomorrow")],
-        [InlineKeyboardButton(text="📅 Эта неделя", callback_data="filter:week")],
-        [InlineKeyboardButton(text="📅 Этот месяц", callback_data="filter:month")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="admin:all")],
-        [InlineKeyboardButton(text="❌ Отмена", callback_data="admin:cancel")],
-    ]
-    await callback.message.edit_text("Выберите фильтр", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
-    await callback.answer()
+@router.callback_query(F.data == "admin:filters")
+async def cb_admin_filters(callback: types.CallbackQuery, state: FSMContext) -> None:
+    await state.update_data(view_rendered=None)
+    await enqueue_edit(callback.message, "Выберите фильтр", FILTERS_KB)
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("filter:"))
-async def cb_filter(callback: types.CallbackQuery) -> None:
-    filter_key = callback.data.split(":")[1]
-    admin_views[callback.from_user.id]["filter"] = filter_key
-    admin_views[callback.from_user.id]["page"] = 0
-    try:
-        tasks = await get_all_tasks()
-    except RuntimeError as exc:
-        await callback.answer(str(exc), show_alert=True)
+@router.callback_query(F.data.startswith("filter:"))
+async def cb_filter(callback: types.CallbackQuery, state: FSMContext) -> None:
+    _, _, filter_key = callback.data.partition(":")
+    data = await state.get_data()
+    if data.get("view_rendered") == [callback.message.message_id, filter_key, 0]:
+        # The page for this filter is already on screen (e.g. a double tap).
+        _ack(callback)
         return
-    await render_tasks_page(callback, tasks)
+    await state.update_data(view_filter=filter_key, view_page=0, view_group=None)
+    await render_tasks_page(callback, state)
 
 
-@router.callback_query(lambda c: c.data == "noop")
+@router.callback_query(F.data == "noop")
 async def cb_noop(callback: types.CallbackQuery) -> None:
-    await callback.answer()
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data == "admin:overdue")
-async def cb_overdue(callback: types.CallbackQuery) -> None:
-    try:
-        tasks = await get_all_tasks()
-    except RuntimeError as exc:
-        await callback.answer(str(exc), show_alert=True)
-        return
-    overdue_tasks = [t for t in tasks if is_overdue(t)]
-    if not overdue_tasks:
-        await callback.message.edit_text("Просроченных задач нет", reply_markup=admin_panel_keyboard())
-        await callback.answer()
-        return
-    await send_task_cards(callback.message, overdue_tasks)
-    await callback.answer()
+@router.callback_query(F.data == "admin:overdue")
+async def cb_overdue(callback: types.CallbackQuery, state: FSMContext) -> None:
+    await state.update_data(view_filter="overdue", view_page=0, view_group=None, view_rendered=None)
+    await render_tasks_page(callback, state)
 
 
-@router.callback_query(lambda c: c.data == "admin:by_user")
+@router.callback_query(F.data == "admin:by_user")
 async def cb_by_user(callback: types.CallbackQuery) -> None:
     try:
-        tasks = await get_all_tasks()
+        index, _ = await asyncio.gather(get_task_index(), fetch_users_from_api())
     except RuntimeError as exc:
         await callback.answer(str(exc), show_alert=True)
         return
-    await fetch_users_from_api()
     users_cfg: List[dict] = users_cache
-    lines: List[str] = []
-    for user in users_cfg:
-        handle = normalize_handle(user.get("username", ""))
-        full_name = user.get("full_name", handle)
-        user_tasks = [t for t in tasks if t.get("assigned_to") == handle]
-        active_count = len([t for t in user_tasks if t.get("status") == "active"])
-        completed_count = len([t for t in user_tasks if t.get("status") == "completed"])
-        lines.append(f"{full_name} ({handle})")
-        lines.append(f"Активных: {active_count}")
-        lines.append(f"Выполнено: {completed_count}")
-        lines.append("Активные задачи:")
-        for task in user_tasks:
-            if task.get("status") != "active":
-                continue
-            overdue_flag = " 🔴" if is_overdue(task) else ""
-            lines.append(f"- {task.get('task_text')} ({task.get('deadline')}){overdue_flag}")
-        lines.append("")
-    await callback.message.edit_text("\n".join(lines) or "Пользователи не найдены", reply_markup=admin_panel_keyboard())
-    await callback.answer()
-
-
-@router.callback_query(lambda c: c.data == "admin:by_group")
+
+    def user_block(user: dict) -> str:
+        handle = user["_norm_handle"]
+        user_active: List[str] = []
+        completed_count = 0
+        for task in index.by_handle.get(handle, ()):
+            status = task.get("status")
+            if status == "active":
+                overdue_flag = " 🔴" if task["_overdue"] else ""
+                user_active.append(f"- {task.get('task_text')} ({format_deadline(task)}){overdue_flag}")
+            elif status == "completed":
+                completed_count += 1
+        header = (
+            f"{user.get('full_name', handle)} ({handle})\n"
+            f"Активных: {len(user_active)}\n"
+            f"Выполнено: {completed_count}\n"
+            "Активные задачи:"
+        )
+        return "\n".join((header, *user_active))
+
+    text = "\n\n".join(user_block(user) for user in users_cfg)
+    await enqueue_edit(callback.message, text or "Пользователи не найдены", reply_markup=admin_panel_keyboard())
+    _ack(callback)
+
+
+@router.callback_query(F.data == "admin:by_group")
 async def cb_by_group(callback: types.CallbackQuery) -> None:
     try:
-        tasks = await get_all_tasks()
+        index = await get_task_index()
     except RuntimeError as exc:
         await callback.answer(str(exc), show_alert=True)
         return
-    groups: Dict[str, List[dict]] = defaultdict(list)
-    for task in tasks:
-        groups[str(task.get("group_id", ""))].append(task)
     buttons: List[List[InlineKeyboardButton]] = []
     lines: List[str] = ["Сводка по группам"]
-    for group_id, group_tasks in groups.items():
-        active = len([t for t in group_tasks if t.get("status") == "active"])
-        completed = len([t for t in group_tasks if t.get("status") == "completed"])
-        overdue = len([t for t in group_tasks if is_overdue(t)])
+    for group_id, group_tasks in index.by_group.items():
+        active = completed = overdue = 0
+        for task in group_tasks:
+            status = task.get("status")
+            if status == "active":
+                active += 1
+            elif status == "completed":
+                completed += 1
+            if task["_overdue"]:
+                overdue += 1
         lines.append(f"Группа {group_id}: 🟡 {active} / 🟢 {completed} / 🔴 {overdue}")
         buttons.append([InlineKeyboardButton(text=f"Группа {group_id}", callback_data=f"group:view:{group_id}")])
     buttons.append([InlineKeyboardButton(text="🏠 Главное меню", callback_data="menu:main")])
-    await callback.message.edit_text("\n".join(lines), reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
-    await callback.answer()
+    await enqueue_edit(callback.message, "\n".join(lines), reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("group:view:"))
-async def cb_view_group(callback: types.CallbackQuery) -> None:
-    _, _, group_id_str = callback.data.split(":")
-    try:
-        tasks = await get_all_tasks()
-    except RuntimeError as exc:
-        await callback.answer(str(exc), show_alert=True)
-        return
-    group_tasks = [t for t in tasks if str(t.get("group_id")) == group_id_str]
-    if not group_tasks:
-        await callback.answer("Задачи не найдены", show_alert=True)
-        return
-    await callback.message.edit_text(f"Задачи группы {group_id_str}")
-    await send_task_cards(callback.message, group_tasks)
-    await callback.answer()
+@router.callback_query(F.data.startswith("group:view:"))
+async def cb_view_group(callback: types.CallbackQuery, state: FSMContext) -> None:
+    _, _, group_id_str = callback.data.split(":", maxsplit=2)
+    await state.update_data(view_filter="all", view_page=0, view_group=group_id_str, view_rendered=None)
+    await render_tasks_page(callback, state)
 
 
-@router.callback_query(lambda c: c.data == "admin:manage")
+@router.callback_query(F.data == "admin:manage")
 async def cb_manage(callback: types.CallbackQuery) -> None:
-    rows = [
-        [InlineKeyboardButton(text="✏️ Изменить текст задачи", callback_data="manage:edit_text")],
-        [InlineKeyboardButton(text="⏰ Изменить срок", callback_data="manage:deadline")],
-        [InlineKeyboardButton(text="👤 Переназначить исполнителя", callback_data="manage:reassign")],
-        [InlineKeyboardButton(text="🗑 Удалить задачу", callback_data="manage:delete")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="menu:admin")],
-    ]
-    await callback.message.edit_text("Управление задачами", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
-    await callback.answer()
+    await enqueue_edit(callback.message, "Управление задачами", MANAGE_KB)
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("manage:"))
+@router.callback_query(F.data.startswith("manage:"))
 async def cb_manage_actions(callback: types.CallbackQuery, state: FSMContext) -> None:
-    action = callback.data.split(":")[1]
+    _, _, action = callback.data.partition(":")
     try:
         tasks = await get_all_tasks()
     except RuntimeError as exc:
         await callback.answer(str(exc), show_alert=True)
         return
     lines = [f"{idx+1}. #{t['id']} {t['task_text']}" for idx, t in enumerate(tasks)]
-    buttons = [[InlineKeyboardButton(text=f"{idx+1}", callback_data=f"select:{action}:{t['id']}")] for idx, t in enumerate(tasks)]
+    buttons = [[InlineKeyboardButton(text=f"{idx+1}", callback_data=task_cb(CB_SELECT, action, t["id"]))] for idx, t in enumerate(tasks)]
     buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="admin:cancel")])
-    await callback.message.edit_text(
-        "Выберите задачу:\n" + "\n".join(lines), reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons)
+    await enqueue_edit(
+        callback.message,
+        "Выберите задачу:\n" + "\n".join(lines),
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons),
     )
-    await callback.answer()
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("select:"))
+@functools.lru_cache(maxsize=2048)
+def _deadline_kb(task_id: int, with_cancel: bool) -> InlineKeyboardMarkup:
+    rows = [
+        [InlineKeyboardButton(text=label, callback_data=f"{CB_DEADLINE_UPDATE}:{task_id}:{code}")]
+        for code, label in DEADLINE_CHOICE_LABELS
+    ]
+    if with_cancel:
+        rows.append([InlineKeyboardButton(text="❌ Отмена", callback_data="admin:cancel")])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+@router.callback_query(F.data.startswith(cb_prefixes(CB_SELECT)))
 async def cb_select_task(callback: types.CallbackQuery, state: FSMContext) -> None:
-    _, action, task_id_str = callback.data.split(":")
-    task_id = int(task_id_str)
+    action, task_id = parse_task_cb(callback.data)
     if action == "delete":
         try:
             await delete_task_via_api(task_id)
-            await callback.message.edit_text("Задача удалена")
+            await enqueue_edit(callback.message, "Задача удалена")
         except RuntimeError as exc:
             await callback.answer(str(exc), show_alert=True)
         return
     if action == "edit_text":
-        selected_task_for_text[callback.from_user.id] = task_id
+        await state.update_data(text_task_id=task_id)
         await state.set_state(ManageTextState.waiting_text)
-        await callback.message.edit_text("Введите новый текст задачи")
-        await callback.answer()
+        await enqueue_edit(callback.message, "Введите новый текст задачи")
+        _ack(callback)
         return
     if action == "deadline":
-        selected_task_for_deadline[callback.from_user.id] = task_id
-        rows = [
-            [InlineKeyboardButton(text="⏰ Сегодня", callback_data=f"deadline_update:{task_id}:today")],
-            [InlineKeyboardButton(text="⏰ Завтра", callback_data=f"deadline_update:{task_id}:tomorrow")],
-            [InlineKeyboardButton(text="⏰ Через 3 дня", callback_data=f"deadline_update:{task_id}:3days")],
-            [InlineKeyboardButton(text="⏰ Через неделю", callback_data=f"deadline_update:{task_id}:week")],
-            [InlineKeyboardButton(text="📅 Указать дату", callback_data=f"deadline_update:{task_id}:custom")],
-            [InlineKeyboardButton(text="❌ Отмена", callback_data="admin:cancel")],
-        ]
-        await callback.message.edit_text("Выберите новый срок", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
-        await callback.answer()
+        await state.update_data(deadline_task_id=task_id)
+        await enqueue_edit(callback.message, "Выберите новый срок", reply_markup=_deadline_kb(task_id, with_cancel=True))
+        _ack(callback)
         return
     if action == "reassign":
         try:
@@ -1094,26 +1511,18 @@ async def cb_select_task(callback: types.CallbackQuery, state: FSMContext) -> No
         return
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("admin_task:"))
-async def cb_admin_task_actions(callback: types.CallbackQuery) -> None:
-    _, action, task_id_str = callback.data.split(":")
-    task_id = int(task_id_str)
+@router.callback_query(F.data.startswith(cb_prefixes(CB_ADMIN_TASK)))
+async def cb_admin_task_actions(callback: types.CallbackQuery, state: FSMContext) -> None:
+    action, task_id = parse_task_cb(callback.data)
     try:
         if action == "complete":
             await update_task_status_via_api(task_id, "completed")
         elif action == "reopen":
             await update_task_status_via_api(task_id, "active")
         elif action == "deadline":
-            selected_task_for_deadline[callback.from_user.id] = task_id
-            rows = [
-                [InlineKeyboardButton(text="⏰ Сегодня", callback_data=f"deadline_update:{task_id}:today")],
-                [InlineKeyboardButton(text="⏰ Завтра", callback_data=f"deadline_update:{task_id}:tomorrow")],
-                [InlineKeyboardButton(text="⏰ Через 3 дня", callback_data=f"deadline_update:{task_id}:3days")],
-                [InlineKeyboardButton(text="⏰ Через неделю", callback_data=f"deadline_update:{task_id}:week")],
-                [InlineKeyboardButton(text="📅 Указать дату", callback_data=f"deadline_update:{task_id}:custom")],
-            ]
-            await callback.message.answer("Выберите новый срок", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
-            await callback.answer()
+            await state.update_data(deadline_task_id=task_id)
+            await callback.message.answer("Выберите новый срок", reply_markup=_deadline_kb(task_id, with_cancel=False))
+            _ack(callback)
             return
         elif action == "reassign":
             await callback.answer("Для переназначения создайте копии задачи на новых исполнителей", show_alert=True)
@@ -1129,15 +1538,14 @@ async def cb_admin_task_actions(callback: types.CallbackQuery) -> None:
     await callback.answer("Готово")
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("deadline_update:"))
+@router.callback_query(F.data.startswith(cb_prefixes(CB_DEADLINE_UPDATE)))
 async def cb_deadline_update(callback: types.CallbackQuery, state: FSMContext) -> None:
-    _, task_id_str, choice = callback.data.split(":")
-    task_id = int(task_id_str)
+    task_id, choice = parse_deadline_cb(callback.data)
     if choice == "custom":
-        selected_task_for_deadline[callback.from_user.id] = task_id
+        await state.update_data(deadline_task_id=task_id)
         await state.set_state(ManageDeadlineState.waiting_deadline)
-        await callback.message.edit_text("Отправьте новую дату сообщением (ДД.ММ.ГГГГ)")
-        await callback.answer()
+        await enqueue_edit(callback.message, "Отправьте новую дату сообщением (ДД.ММ.ГГГГ)")
+        _ack(callback)
         return
     deadline_str = deadline_from_choice(choice)
     try:
@@ -1145,13 +1553,13 @@ async def cb_deadline_update(callback: types.CallbackQuery, state: FSMContext) -
     except RuntimeError as exc:
         await callback.answer(str(exc), show_alert=True)
         return
-    await callback.message.edit_text("Срок обновлен")
-    await callback.answer()
+    await enqueue_edit(callback.message, "Срок обновлен")
+    _ack(callback)
 
 
 @router.message(ManageDeadlineState.waiting_deadline)
 async def msg_deadline_text(message: types.Message, state: FSMContext) -> None:
-    task_id = selected_task_for_deadline.pop(message.from_user.id, None)
+    task_id = (await state.get_data()).get("deadline_task_id")
     await state.clear()
     if not task_id:
         await message.answer("Задача не выбрана")
@@ -1165,7 +1573,7 @@ async def msg_deadline_text(message: types.Message, state: FSMContext) -> None:
 
 @router.message(ManageTextState.waiting_text)
 async def msg_new_task_text(message: types.Message, state: FSMContext) -> None:
-    task_id = selected_task_for_text.pop(message.from_user.id, None)
+    task_id = (await state.get_data()).get("text_task_id")
     await state.clear()
     if not task_id:
         await message.answer("Задача не выбрана")
@@ -1177,75 +1585,75 @@ async def msg_new_task_text(message: types.Message, state: FSMContext) -> None:
         await message.answer(str(exc))
 
 
-@router.callback_query(lambda c: c.data == "admin:notify")
-async def cb_notify(callback: types.CallbackQuery) -> None:
-    settings = {
-        key: config.get(key, DEFAULT_CONFIG[key])
-        for key in ("task_created", "task_completed", "task_deleted", "overdue_reminder")
-    }
+NOTIFY_KEYS = ("task_created", "task_completed", "task_deleted", "overdue_reminder")
+
+
+@functools.lru_cache(maxsize=16)
+def notify_keyboard(created: bool, completed: bool, deleted: bool, overdue: bool) -> InlineKeyboardMarkup:
+    # Four flags give at most 16 distinct keyboards; build each once.
     rows = [
-        [InlineKeyboardButton(text=f"{'🔔' if settings.get('task_created') else '🔕'} Создание задач", callback_data="notify:task_created")],
-        [InlineKeyboardButton(text=f"{'✅' if settings.get('task_completed') else '❌'} Завершение задач", callback_data="notify:task_completed")],
-        [InlineKeyboardButton(text=f"{'🗑' if settings.get('task_deleted') else '📥'} Удаление задач", callback_data="notify:task_deleted")],
-        [InlineKeyboardButton(text=f"{'⏰' if settings.get('overdue_reminder') else '⏳'} Напоминания о просрочке", callback_data="notify:overdue_reminder")],
+        [InlineKeyboardButton(text=f"{'🔔' if created else '🔕'} Создание задач", callback_data="notify:task_created")],
+        [InlineKeyboardButton(text=f"{'✅' if completed else '❌'} Завершение задач", callback_data="notify:task_completed")],
+        [InlineKeyboardButton(text=f"{'🗑' if deleted else '📥'} Удаление задач", callback_data="notify:task_deleted")],
+        [InlineKeyboardButton(text=f"{'⏰' if overdue else '⏳'} Напоминания о просрочке", callback_data="notify:overdue_reminder")],
         [InlineKeyboardButton(text="🔙 Назад", callback_data="menu:admin")],
     ]
-    await callback.message.edit_text("Настройки уведомлений", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
-    await callback.answer()
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("notify:"))
+@router.callback_query(F.data == "admin:notify")
+async def cb_notify(callback: types.CallbackQuery) -> None:
+    flags = (bool(config.get(key, DEFAULT_CONFIG[key])) for key in NOTIFY_KEYS)
+    await enqueue_edit(callback.message, "Настройки уведомлений", notify_keyboard(*flags))
+    _ack(callback)
+
+
+@router.callback_query(F.data.startswith("notify:"))
 async def cb_notify_toggle(callback: types.CallbackQuery) -> None:
-    _, key = callback.data.split(":")
+    _, _, key = callback.data.partition(":")
     config[key] = not config.get(key, True)
-    await save_config_to_api(config)
+    persist_config(config)
     await cb_notify(callback)
 
 
-@router.callback_query(lambda c: c.data == "admin:users")
+@router.callback_query(F.data == "admin:users")
 async def cb_users(callback: types.CallbackQuery) -> None:
-    rows = [
-        [InlineKeyboardButton(text="➕ Добавить пользователя", callback_data="users:add")],
-        [InlineKeyboardButton(text="🗑 Удалить пользователя", callback_data="users:remove")],
-        [InlineKeyboardButton(text="📋 Список пользователей", callback_data="users:list")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="menu:admin")],
-    ]
-    await callback.message.edit_text("Управление пользователями", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
-    await callback.answer()
+    await enqueue_edit(callback.message, "Управление пользователями", USERS_KB)
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("users:"))
+@router.callback_query(F.data.in_({"users:list", "users:add", "users:remove"}))
 async def cb_users_actions(callback: types.CallbackQuery, state: FSMContext) -> None:
-    action = callback.data.split(":")[1]
+    _, _, action = callback.data.partition(":")
     await fetch_users_from_api()
     if action == "list":
         lines = [f"{u.get('full_name', '')} ({u.get('username')})" for u in users_cache]
-        await callback.message.edit_text("\n".join(lines) or "Нет пользователей")
-        await callback.answer()
+        await enqueue_edit(callback.message, "\n".join(lines) or "Нет пользователей")
+        _ack(callback)
         return
     if action == "add":
         await state.set_state(AddUserState.username)
-        await callback.message.edit_text("Введите @username нового пользователя")
-        await callback.answer()
+        await enqueue_edit(callback.message, "Введите @username нового пользователя")
+        _ack(callback)
         return
     if action == "remove":
         buttons = [[InlineKeyboardButton(text=u.get("username"), callback_data=f"users:remove:{u.get('username')}")] for u in users_cache]
         buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="menu:admin")])
-        await callback.message.edit_text("Выберите пользователя для удаления", reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
-        await callback.answer()
+        await enqueue_edit(callback.message, "Выберите пользователя для удаления", reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
+        _ack(callback)
         return
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("users:remove:"))
+@router.callback_query(F.data.startswith("users:remove:"))
 async def cb_remove_user(callback: types.CallbackQuery) -> None:
-    username = callback.data.split(":")[2]
+    username = callback.data.split(":", maxsplit=2)[2]
     try:
         await delete_user_via_api(username)
         await fetch_users_from_api()
-        await callback.message.edit_text("Пользователь удален")
+        await enqueue_edit(callback.message, "Пользователь удален")
     except RuntimeError as exc:
-        await callback.message.edit_text(str(exc))
-    await callback.answer()
+        await enqueue_edit(callback.message, str(exc))
+    _ack(callback)
 
 
 @router.message(AddUserState.username)
@@ -1277,67 +1685,61 @@ async def add_user_groups(message: types.Message, state: FSMContext) -> None:
     await message.answer("Пользователь добавлен", reply_markup=admin_panel_keyboard())
 
 
-@router.callback_query(lambda c: c.data == "admin:admins")
+@router.callback_query(F.data == "admin:admins")
 async def cb_admins(callback: types.CallbackQuery) -> None:
-    rows = [
-        [InlineKeyboardButton(text="➕ Добавить администратора", callback_data="admins:add")],
-        [InlineKeyboardButton(text="🗑 Удалить администратора", callback_data="admins:remove")],
-        [InlineKeyboardButton(text="📋 Список администраторов", callback_data="admins:list")],
-        [InlineKeyboardButton(text="🔙 Назад", callback_data="menu:admin")],
-    ]
-    await callback.message.edit_text("Управление администраторами", reply_markup=InlineKeyboardMarkup(inline_keyboard=rows))
-    await callback.answer()
+    await enqueue_edit(callback.message, "Управление администраторами", ADMINS_KB)
+    _ack(callback)
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("admins:"))
+@router.callback_query(F.data.in_({"admins:list", "admins:add", "admins:remove"}))
 async def cb_admins_actions(callback: types.CallbackQuery, state: FSMContext) -> None:
-    action = callback.data.split(":")[1]
+    _, _, action = callback.data.partition(":")
     await fetch_config_from_api()
     if action == "list":
         lines = [admin for admin in config.get("admins", [])]
-        await callback.message.edit_text("\n".join(lines) or "Нет администраторов")
-        await callback.answer()
+        await enqueue_edit(callback.message, "\n".join(lines) or "Нет администраторов")
+        _ack(callback)
         return
     if action == "add":
         await state.set_state(AddAdminState.username)
-        await callback.message.edit_text("Введите @username администратора")
-        await callback.answer()
+        await enqueue_edit(callback.message, "Введите @username администратора")
+        _ack(callback)
         return
     if action == "remove":
         buttons = [[InlineKeyboardButton(text=adm, callback_data=f"admins:remove:{adm}")] for adm in config.get("admins", [])]
         buttons.append([InlineKeyboardButton(text="❌ Отмена", callback_data="menu:admin")])
-        await callback.message.edit_text("Выберите администратора для удаления", reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
-        await callback.answer()
+        await enqueue_edit(callback.message, "Выберите администратора для удаления", reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons))
+        _ack(callback)
         return
 
 
-@router.callback_query(lambda c: c.data and c.data.startswith("admins:remove:"))
+@router.callback_query(F.data.startswith("admins:remove:"))
 async def cb_remove_admin(callback: types.CallbackQuery) -> None:
-    username = callback.data.split(":")[2]
-    config["admins"] = [adm for adm in config.get("admins", []) if adm != username]
-    await save_config_to_api(config)
-    await callback.message.edit_text("Администратор удален")
-    await callback.answer()
+    username = callback.data.split(":", maxsplit=2)[2]
+    _admin_set.discard(username)
+    config["admins"] = sorted(_admin_set)
+    persist_config(config)
+    await enqueue_edit(callback.message, "Администратор удален")
+    _ack(callback)
 
 
 @router.message(AddAdminState.username)
 async def add_admin_username(message: types.Message, state: FSMContext) -> None:
     username = normalize_handle(message.text.strip())
-    admins = set(config.get("admins", []))
-    admins.add(username)
-    config["admins"] = list(admins)
-    await save_config_to_api(config)
+    _admin_set.add(username)
+    config["admins"] = sorted(_admin_set)
+    persist_config(config)
     await state.clear()
     await message.answer("Администратор добавлен", reply_markup=admin_panel_keyboard())
 
 
-@router.callback_query(lambda c: c.data == "admin:cancel")
+@router.callback_query(F.data == "admin:cancel")
 async def cb_cancel(callback: types.CallbackQuery) -> None:
-    await callback.message.edit_text("Действие отменено", reply_markup=admin_panel_keyboard())
-    await callback.answer()
+    await enqueue_edit(callback.message, "Действие отменено", reply_markup=admin_panel_keyboard())
+    _ack(callback)
 
 
-@router.message(lambda m: m.text and m.text.startswith("/done"))
+@router.message(Command("done"))
 async def cmd_done(message: types.Message) -> None:
     parts = message.text.split()
     if len(parts) < 2:
@@ -1356,11 +1758,75 @@ async def cmd_done(message: types.Message) -> None:
     await message.answer(f"✅ Задача #{task_id} отмечена как выполненная")
 
 
-@router.message(lambda m: m.text and m.text.startswith("/mytasks"))
+@router.message(Command("mytasks"))
 async def cmd_mytasks_text(message: types.Message) -> None:
     await message.answer("📋 Мои задачи", reply_markup=my_tasks_keyboard())
 
 
+_LEASE_HOLDER = f"{socket.gethostname()}:{os.getpid()}"
+_lease_task: Optional[asyncio.Task] = None
+
+
+class PollLeaseHeld(RuntimeError):
+    """Another instance holds the polling lease for this token."""
+
+
+def _poll_lease_key(bot: Bot) -> str:
+    # The lease is keyed on a hash so the token itself never leaves the process.
+    return hashlib.sha256(bot.token.encode()).hexdigest()
+
+
+async def _renew_poll_lease(lease_key: str) -> None:
+    while True:
+        await asyncio.sleep(POLL_LEASE_RENEW_EVERY)
+        if await acquire_poll_lease_via_api(lease_key, _LEASE_HOLDER) is False:
+            logger.error("Another instance took over the polling lease; stopping")
+            await dp.stop_polling()
+            return
+
+
+@dp.startup()
+async def on_startup(bot: Bot) -> None:
+    global _http, _lease_task
+    _http = httpx.AsyncClient(
+        base_url=BASE_API_URL,
+        timeout=httpx.Timeout(connect=5.0, read=15.0, write=15.0, pool=30.0),
+        limits=httpx.Limits(
+            max_connections=HTTPX_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTPX_MAX_KEEPALIVE,
+            keepalive_expiry=30.0,
+        ),
+    )
+    lease_key = _poll_lease_key(bot)
+    acquired = await acquire_poll_lease_via_api(lease_key, _LEASE_HOLDER)
+    if acquired is False:
+        await _http.aclose()
+        raise PollLeaseHeld("Another bot instance is already polling with this token")
+    if acquired is None:
+        # The API may still be starting up; the renew loop keeps trying.
+        logger.warning("Starting without a polling lease")
+    _lease_task = asyncio.create_task(_renew_poll_lease(lease_key))
+    for _ in range(EDIT_WORKERS):
+        _edit_workers.append(asyncio.create_task(_edit_worker()))
+    await sync_bot_state()
+
+
+@dp.shutdown()
+async def on_shutdown(bot: Bot) -> None:
+    global _lease_task
+    if _lease_task is not None:
+        _lease_task.cancel()
+        await asyncio.gather(_lease_task, return_exceptions=True)
+        _lease_task = None
+    for worker in _edit_workers:
+        worker.cancel()
+    await asyncio.gather(*_edit_workers, return_exceptions=True)
+    _edit_workers.clear()
+    if _http is not None:
+        await release_poll_lease_via_api(_poll_lease_key(bot), _LEASE_HOLDER)
+        await _http.aclose()
+
+
 async def main() -> None:
     token = os.getenv("TELEGRAM_BOT_TOKEN")
     if not token:
@@ -1368,13 +1834,28 @@ async def main() -> None:
         return
 
     bot = Bot(token=token, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-    dp = Dispatcher()
-    dp.include_router(router)
 
     logger.info("Bot started")
-    await sync_bot_state()
-    await dp.start_polling(bot)
+    # Each update runs as its own task, so a handler waiting on the API does not
+    # hold up updates from other users.
+    try:
+        await dp.start_polling(bot, handle_as_tasks=True)
+    except PollLeaseHeld as exc:
+        logger.error("%s", exc)
+        # Startup failed, so aiogram skips the shutdown hooks and the session close.
+        await bot.session.close()
+        raise SystemExit(1) from exc
+
+
+def _run() -> None:
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(main())
+        return
+    # Optional: uvloop schedules callbacks and socket I/O faster than the default loop.
+    uvloop.run(main())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    _run()
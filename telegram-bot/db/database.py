@@ -1,117 +1,138 @@
+import functools
 import logging
 import sqlite3
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Callable, Iterator, TypeVar
+
+from db.pool import ConnectionPool
 
 
 DB_PATH = Path(__file__).resolve().parent.parent / "tasks.db"
+READ_POOL_SIZE = 4
+# Prepared statements kept per connection (sqlite3's default is 128).
+STATEMENT_CACHE_SIZE = 256
+WRITE_RETRIES = 4
+WRITE_RETRY_DELAY = 0.01
+
+_T = TypeVar("_T")
+
+
+# schema.sql is the single source for tables, indexes and default config rows.
+SCHEMA_PATH = Path(__file__).resolve().parent / "schema.sql"
+SCHEMA = SCHEMA_PATH.read_text(encoding="utf-8")
+
+
+def _dmy_to_iso_sql(table: str, column: str, time_sep: str) -> str:
+    """UPDATE rewriting DD.MM.YYYY[ HH:MM:SS] values of column as ISO 8601."""
+    return f"""
+UPDATE {table}
+SET {column} = substr({column}, 7, 4) || '-' || substr({column}, 4, 2) || '-' || substr({column}, 1, 2)
+    || CASE WHEN length({column}) > 10 THEN '{time_sep}' || substr({column}, 12) ELSE '' END
+WHERE {column} GLOB '[0-9][0-9].[0-9][0-9].[0-9][0-9][0-9][0-9]*'"""
+
+
+# Older rows kept DD.MM.YYYY deadlines and DD.MM.YYYY HH:MM:SS timestamps;
+# rewrite them as ISO 8601 so they sort and compare as text.
+MIGRATIONS_SQL = ";\n".join(
+    (
+        _dmy_to_iso_sql("task_groups", "deadline", " "),
+        _dmy_to_iso_sql("task_groups", "created_at", "T"),
+        _dmy_to_iso_sql("tasks", "created_at", "T"),
+        _dmy_to_iso_sql("tasks", "completed_at", "T"),
+    )
+)
+
+
+# Per-connection settings. journal_mode=WAL is persistent in the database
+# file, so init_db sets it once; NORMAL then only fsyncs at checkpoints.
+CONNECTION_PRAGMAS = (
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -65536",  # 64 MiB
+    "PRAGMA mmap_size = 268435456",  # 256 MiB
+    "PRAGMA busy_timeout = 5000",
+)
 
 
 def get_connection() -> sqlite3.Connection:
-    connection = sqlite3.connect(DB_PATH)
-    connection.execute("PRAGMA foreign_keys = ON")
+    connection = sqlite3.connect(
+        DB_PATH, check_same_thread=False, cached_statements=STATEMENT_CACHE_SIZE
+    )
+    for pragma in CONNECTION_PRAGMAS:
+        connection.execute(pragma)
     return connection
 
 
+def get_readonly_connection() -> sqlite3.Connection:
+    connection = sqlite3.connect(
+        f"file:{DB_PATH}?mode=ro",
+        uri=True,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    for pragma in CONNECTION_PRAGMAS:
+        connection.execute(pragma)
+    return connection
+
+
+# FastAPI runs the sync endpoints in a thread pool; connections are handed out
+# to one thread at a time by the pool.
+_pool = ConnectionPool(get_connection, get_readonly_connection, max_readers=READ_POOL_SIZE)
+
+
+@contextmanager
+def connection(readonly: bool = False) -> Iterator[sqlite3.Connection]:
+    """Yield a pooled connection: the shared writer, or a read-only one for queries."""
+    with _pool.acquire(readonly) as conn:
+        yield conn
+
+
+def retry_write(func: Callable[..., _T]) -> Callable[..., _T]:
+    """Retry a repository write with exponential backoff while the database is locked.
+
+    busy_timeout already waits inside sqlite; this covers the cases where it
+    gives up (e.g. a long checkpoint). The wrapped method must roll back on error.
+    """
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs) -> _T:
+        for attempt in range(WRITE_RETRIES):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as exc:
+                if "locked" not in str(exc) or attempt == WRITE_RETRIES - 1:
+                    raise
+                logging.warning("Database locked, retrying %s", func.__name__)
+                time.sleep(WRITE_RETRY_DELAY * 2**attempt)
+        raise AssertionError("unreachable")
+
+    return wrapper
+
+
+def _optimize(conn: sqlite3.Connection) -> None:
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        logging.exception("PRAGMA optimize failed")
+
+
+def close_db() -> None:
+    """Let sqlite refresh its planner statistics, then close all pooled connections."""
+    _pool.close(before_close=_optimize)
+
+
 def init_db() -> None:
     logging.info("Initializing database at %s", DB_PATH)
-    connection: Optional[sqlite3.Connection] = None
-    try:
-        connection = get_connection()
-        cursor = connection.cursor()
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                username TEXT PRIMARY KEY,
-                full_name TEXT
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS groups (
-                id TEXT PRIMARY KEY,
-                name TEXT NOT NULL
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS user_groups (
-                username TEXT NOT NULL,
-                group_id TEXT NOT NULL,
-                PRIMARY KEY (username, group_id),
-                FOREIGN KEY (username) REFERENCES users (username) ON DELETE CASCADE,
-                FOREIGN KEY (group_id) REFERENCES groups (id) ON DELETE CASCADE
-            )
-            """
-        )
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_user_groups_username ON user_groups (username)"
-        )
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_user_groups_group_id ON user_groups (group_id)"
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS config (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS task_groups (
-                group_task_id INTEGER PRIMARY KEY,
-                task_text TEXT NOT NULL,
-                deadline TEXT NOT NULL,
-                group_id TEXT NOT NULL,
-                created_at TEXT NOT NULL
-            )
-            """
-        )
-        cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS tasks (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                group_task_id INTEGER NOT NULL,
-                assigned_to TEXT NOT NULL,
-                assigned_by TEXT NOT NULL,
-                status TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                completed_at TEXT NOT NULL,
-                FOREIGN KEY (group_task_id) REFERENCES task_groups (group_task_id)
-            )
-            """
-        )
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_tasks_group_task_id ON tasks (group_task_id)"
-        )
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_tasks_assigned_to ON tasks (assigned_to)"
-        )
-        cursor.execute(
-            "CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status)"
-        )
-        cursor.executemany(
-            "INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)",
-            [
-                ("task_created", "true"),
-                ("task_completed", "true"),
-                ("task_deleted", "true"),
-                ("overdue_reminder", "true"),
-                ("admins", "[]"),
-                ("group_chat_ids", "[]"),
-            ],
-        )
-        connection.commit()
-        logging.info("Database initialized successfully")
-    except Exception:
-        if connection:
-            connection.rollback()
-        logging.exception("Failed to initialize database")
-        raise
-    finally:
-        if connection:
-            connection.close()
+    with connection() as conn:
+        try:
+            conn.execute("PRAGMA journal_mode = WAL")
+            # One executescript call, one transaction for the whole bootstrap.
+            conn.executescript(f"BEGIN;\n{SCHEMA}\n{MIGRATIONS_SQL};\nCOMMIT;")
+            logging.info("Database initialized successfully")
+        except Exception:
+            conn.rollback()
+            logging.exception("Failed to initialize database")
+            raise
@@ -0,0 +1,67 @@
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+class ConnectionPool:
+    """One shared write connection plus a LIFO pool of read-only connections.
+
+    sqlite allows a single writer at a time, so writes are serialised on one
+    connection. Readers are opened lazily, up to ``max_readers``, and reused
+    most-recently-returned first so their page caches stay warm.
+    """
+
+    def __init__(
+        self,
+        connect_writer: Callable[[], sqlite3.Connection],
+        connect_reader: Callable[[], sqlite3.Connection],
+        max_readers: int = 4,
+    ) -> None:
+        self._connect_writer = connect_writer
+        self._connect_reader = connect_reader
+        self._writer: Optional[sqlite3.Connection] = None
+        self._write_lock = threading.RLock()
+        self._readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._reader_slots = threading.BoundedSemaphore(max_readers)
+
+    @contextmanager
+    def acquire(self, readonly: bool = False) -> Iterator[sqlite3.Connection]:
+        if readonly:
+            with self._reader_slots:
+                try:
+                    conn = self._readers.get_nowait()
+                except queue.Empty:
+                    conn = self._connect_reader()
+                try:
+                    yield conn
+                finally:
+                    if conn.in_transaction:
+                        conn.rollback()
+                    self._readers.put_nowait(conn)
+            return
+
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect_writer()
+            try:
+                yield self._writer
+            finally:
+                # Never hand the next caller a transaction left open by this one.
+                if self._writer.in_transaction:
+                    self._writer.rollback()
+
+    def close(self, before_close: Optional[Callable[[sqlite3.Connection], None]] = None) -> None:
+        """Close every pooled connection; ``before_close`` runs on the writer first."""
+        with self._write_lock:
+            if self._writer is not None:
+                if before_close is not None:
+                    before_close(self._writer)
+                self._writer.close()
+                self._writer = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
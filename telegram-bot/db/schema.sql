@@ -42,7 +42,9 @@ INSERT OR IGNORE INTO config (key, value) VALUES
     ('task_created', 'true'),
     ('task_completed', 'true'),
     ('task_deleted', 'true'),
-    ('overdue_reminder', 'true');
+    ('overdue_reminder', 'true'),
+    ('admins', '[]'),
+    ('group_chat_ids', '[]');
 
 ------------------------------------------------------------
 -- Группы задач
@@ -50,9 +52,9 @@ INSERT OR IGNORE INTO config (key, value) VALUES
 CREATE TABLE IF NOT EXISTS task_groups (
     group_task_id INTEGER PRIMARY KEY,
     task_text     TEXT NOT NULL,
-    deadline      TEXT NOT NULL,      -- формат хранения: DD.MM.YYYY
+    deadline      TEXT NOT NULL,      -- формат хранения: YYYY-MM-DD
     group_id      TEXT NOT NULL,
-    created_at    TEXT NOT NULL       -- формат хранения: DD.MM.YYYY HH:MM:SS
+    created_at    TEXT NOT NULL       -- формат хранения: YYYY-MM-DDTHH:MM:SS
 );
 
 ------------------------------------------------------------
@@ -71,4 +73,16 @@ CREATE TABLE IF NOT EXISTS tasks (
 
 CREATE INDEX IF NOT EXISTS idx_tasks_group_task_id ON tasks (group_task_id);
 CREATE INDEX IF NOT EXISTS idx_tasks_assigned_to ON tasks (assigned_to);
-CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status);
+-- (status, group_task_id) covers status filters joined to task_groups and
+-- replaces the old single-column idx_tasks_status.
+DROP INDEX IF EXISTS idx_tasks_status;
+CREATE INDEX IF NOT EXISTS idx_tasks_status_gtid ON tasks (status, group_task_id);
+
+------------------------------------------------------------
+-- Аренда polling для единственного экземпляра бота
+------------------------------------------------------------
+CREATE TABLE IF NOT EXISTS bot_leases (
+    lease_key  TEXT PRIMARY KEY,
+    holder     TEXT NOT NULL,
+    expires_at INTEGER NOT NULL
+);
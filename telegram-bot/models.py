@@ -1,9 +1,25 @@
 from typing import List, Optional
 
-from pydantic import BaseModel, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+__all__ = [
+    "Config",
+    "Group",
+    "LeaseRequest",
+    "Stats",
+    "Task",
+    "TaskAddExecutors",
+    "TaskCreate",
+    "TaskGroup",
+    "TaskGroupUpdate",
+    "TaskStatusUpdate",
+    "User",
+]
 
 
 class TaskGroup(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     group_task_id: int
     task_text: str
     deadline: str
@@ -12,6 +28,8 @@ class TaskGroup(BaseModel):
 
 
 class Task(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: int
     group_task_id: int
     assigned_to: str
@@ -29,17 +47,23 @@ class Task(BaseModel):
 
 
 class User(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     username: str
     full_name: Optional[str] = None
     groups: List[str] = Field(default_factory=list)
 
 
 class Group(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     id: str
     name: str
 
 
 class Config(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     group_chat_ids: List[str] = Field(default_factory=list)
     admins: List[str] = Field(default_factory=list)
     task_created: bool = True
@@ -86,3 +110,8 @@ class TaskStatusUpdate(BaseModel):
         if value not in {"active", "completed"}:
             raise ValueError("status must be 'active' or 'completed'")
         return value
+
+
+class LeaseRequest(BaseModel):
+    holder: str
+    ttl: int = Field(60, ge=1)
@@ -1,52 +1,70 @@
 import json
 import logging
+import threading
+from typing import Optional
 
-from db.database import get_connection
+from db.database import connection, retry_write
 from models import Config
 
 
 class ConfigRepository:
+    """Config rows, parsed once and cached until the next set_config.
+
+    Only this process writes the config table, so the cache never goes stale.
+    """
+
+    def __init__(self) -> None:
+        self._cache: Optional[Config] = None
+        self._lock = threading.Lock()
+
     def get_config(self) -> Config:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT key, value FROM config")
-            rows = cursor.fetchall()
-            defaults = Config().model_dump()
-            for key, value in rows:
-                if key in defaults:
-                    if key in {"admins", "group_chat_ids"}:
-                        try:
-                            defaults[key] = json.loads(value)
-                        except Exception:
-                            defaults[key] = []
-                    else:
-                        defaults[key] = str(value).lower() in {"true", "1", "yes", "on"}
-            return Config(**defaults)
-        except Exception:
-            logging.exception("Failed to fetch config")
-            raise
-        finally:
-            conn.close()
+        with self._lock:
+            if self._cache is None:
+                self._cache = self._load_config()
+            return self._cache
+
+    def _load_config(self) -> Config:
+        with connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT key, value FROM config")
+                defaults = Config().model_dump()
+                for key, value in cursor:
+                    if key in defaults:
+                        if key in {"admins", "group_chat_ids"}:
+                            try:
+                                defaults[key] = json.loads(value)
+                            except Exception:
+                                defaults[key] = []
+                        else:
+                            defaults[key] = str(value).lower() in {"true", "1", "yes", "on"}
+                return Config(**defaults)
+            except Exception:
+                logging.exception("Failed to fetch config")
+                raise
 
+    @retry_write
     def set_config(self, cfg: Config) -> Config:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            for key, val in cfg.model_dump().items():
-                if key in {"admins", "group_chat_ids"}:
-                    stored_val = json.dumps(val)
-                else:
-                    stored_val = "true" if val else "false"
-                cursor.execute(
-                    "INSERT OR REPLACE INTO config (key, value) VALUES (?, ?)",
-                    (key, stored_val),
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                rows = []
+                for key, val in cfg.model_dump().items():
+                    if key in {"admins", "group_chat_ids"}:
+                        stored_val = json.dumps(val)
+                    else:
+                        stored_val = "true" if val else "false"
+                    rows.append((key, stored_val))
+                cursor.executemany(
+                    "INSERT INTO config (key, value) VALUES (?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+                    rows,
                 )
-            conn.commit()
-            return cfg
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to save config")
-            raise
-        finally:
-            conn.close()
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to save config")
+                raise
+        with self._lock:
+            self._cache = cfg
+        return cfg
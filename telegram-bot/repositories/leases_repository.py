@@ -0,0 +1,45 @@
+import logging
+import time
+
+from db.database import connection, retry_write
+
+
+class LeasesRepository:
+    @retry_write
+    def acquire(self, lease_key: str, holder: str, ttl: int) -> bool:
+        """Take or renew the lease; fails while another holder's lease is unexpired."""
+        with connection() as conn:
+            cursor = conn.cursor()
+            now = int(time.time())
+            try:
+                cursor.execute(
+                    """
+                    INSERT INTO bot_leases (lease_key, holder, expires_at) VALUES (?, ?, ?)
+                    ON CONFLICT (lease_key) DO UPDATE
+                    SET holder = excluded.holder, expires_at = excluded.expires_at
+                    WHERE bot_leases.holder = excluded.holder OR bot_leases.expires_at < ?
+                    """,
+                    (lease_key, holder, now + ttl, now),
+                )
+                acquired = cursor.rowcount == 1
+                conn.commit()
+                return acquired
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to acquire lease for %s", holder)
+                raise
+
+    @retry_write
+    def release(self, lease_key: str, holder: str) -> None:
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "DELETE FROM bot_leases WHERE lease_key = ? AND holder = ?",
+                    (lease_key, holder),
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to release lease for %s", holder)
+                raise
@@ -1,26 +1,98 @@
 import logging
 import sqlite3
-from datetime import datetime
-from typing import List, Optional
+from datetime import date, datetime, timedelta
+from typing import Iterator, List, Optional, Tuple
 
-from db.database import get_connection
+from db.database import connection, retry_write
 from models import Task, TaskGroup, TaskGroupUpdate
 
 
+# Deadlines are stored as ISO dates (see normalize_deadline), so SQLite can
+# compare them directly; date() yields NULL for anything malformed.
+DEADLINE_DATE_SQL = "date(tg.deadline)"
+# Date filters as inclusive (first, last) day offsets from today.
+DEADLINE_FILTER_DAYS = {
+    "today": (0, 0),
+    "tomorrow": (1, 1),
+    "week": (0, 7),
+    "month": (0, 30),
+}
+
+
+# Static statements live here so every call passes sqlite3 the same string
+# and hits the connection's prepared-statement cache.
+TASK_COLUMNS = "id, group_task_id, assigned_to, assigned_by, status, created_at, completed_at"
+# Keys of the dicts iter_all_tasks yields, in the order of its SELECT list.
+TASK_LIST_KEYS = (
+    "id",
+    "group_task_id",
+    "task_text",
+    "deadline",
+    "group_id",
+    "assigned_to",
+    "assigned_by",
+    "status",
+    "created_at",
+    "completed_at",
+)
+SQL_NEXT_TASK_ID = "SELECT COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'tasks'), 0)"
+# group_task_id is the rowid alias, so sqlite picks the next id itself.
+SQL_INSERT_TASK_GROUP = (
+    "INSERT INTO task_groups (task_text, deadline, group_id, created_at) VALUES (?, ?, ?, ?)"
+)
+SQL_INSERT_TASK = (
+    "INSERT INTO tasks (group_task_id, assigned_to, assigned_by, status, created_at, completed_at) "
+    "VALUES (?, ?, ?, ?, ?, ?)"
+)
+SQL_TASK_GROUP_EXISTS = "SELECT 1 FROM task_groups WHERE group_task_id = ?"
+SQL_GET_TASKS_BY_GROUP = f"SELECT {TASK_COLUMNS} FROM tasks WHERE group_task_id = ?"
+SQL_GET_TASK_BY_ID = f"SELECT {TASK_COLUMNS} FROM tasks WHERE id = ?"
+SQL_UPDATE_TASK_STATUS = (
+    f"UPDATE tasks SET status = ?, completed_at = ? WHERE id = ? RETURNING {TASK_COLUMNS}"
+)
+SQL_TASK_GROUP_OF = "SELECT group_task_id FROM tasks WHERE id = ?"
+SQL_DELETE_TASK = "DELETE FROM tasks WHERE id = ?"
+SQL_COUNT_GROUP_TASKS = "SELECT COUNT(*) FROM tasks WHERE group_task_id = ?"
+
+
+def normalize_deadline(deadline: str) -> str:
+    """Return DD.MM.YYYY deadlines (as sent by the bot) as YYYY-MM-DD; other values unchanged."""
+    deadline = deadline.strip()
+    try:
+        return datetime.strptime(deadline, "%d.%m.%Y").date().isoformat()
+    except ValueError:
+        return deadline
+
+
 class TasksRepository:
-    def get_next_group_task_id(self, connection: Optional[sqlite3.Connection] = None) -> int:
-        own_connection = connection is None
-        conn = connection or get_connection()
-        try:
-            cursor = conn.cursor()
-            cursor.execute("SELECT MAX(group_task_id) FROM task_groups")
-            row = cursor.fetchone()
-            max_id = row[0] if row and row[0] is not None else 0
-            return max_id + 1
-        finally:
-            if own_connection:
-                conn.close()
+    @staticmethod
+    def _insert_executors(
+        cursor: sqlite3.Cursor, group_task_id: int, assigned_to: List[str], assigned_by: str, now: str
+    ) -> List[Task]:
+        """Insert one task per executor in a single executemany; call inside a write transaction."""
+        # AUTOINCREMENT hands out consecutive ids after sqlite_sequence. Callers
+        # open the transaction with BEGIN IMMEDIATE, so the write lock is held
+        # before sqlite_sequence is read and no other connection can take them.
+        cursor.execute(SQL_NEXT_TASK_ID)
+        first_id = cursor.fetchone()[0] + 1
+        cursor.executemany(
+            SQL_INSERT_TASK,
+            [(group_task_id, executor, assigned_by, "active", now, "") for executor in assigned_to],
+        )
+        return [
+            Task(
+                id=task_id,
+                group_task_id=group_task_id,
+                assigned_to=executor,
+                assigned_by=assigned_by,
+                status="active",
+                created_at=now,
+                completed_at="",
+            )
+            for task_id, executor in enumerate(assigned_to, start=first_id)
+        ]
 
+    @retry_write
     def create_task_group(
         self,
         task_text: str,
@@ -29,287 +101,289 @@ class TasksRepository:
         assigned_to: List[str],
         assigned_by: str,
     ) -> List[Task]:
-        conn = get_connection()
-        cursor = conn.cursor()
-        now = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
-        try:
-            group_task_id = self.get_next_group_task_id(conn)
-            cursor.execute(
-                """
-                INSERT INTO task_groups (group_task_id, task_text, deadline, group_id, created_at)
-                VALUES (?, ?, ?, ?, ?)
-                """,
-                (group_task_id, task_text, deadline, group_id, now),
-            )
-
-            tasks: List[Task] = []
-            for executor in assigned_to:
+        with connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.now().isoformat(timespec="seconds")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
                 cursor.execute(
-                    """
-                    INSERT INTO tasks (
-                        group_task_id, assigned_to, assigned_by, status, created_at, completed_at
-                    ) VALUES (?, ?, ?, ?, ?, ?)
-                    """,
-                    (group_task_id, executor, assigned_by, "active", now, ""),
+                    SQL_INSERT_TASK_GROUP, (task_text, normalize_deadline(deadline), group_id, now)
                 )
-                task_id = cursor.lastrowid
-                tasks.append(
-                    Task(
-                        id=task_id,
-                        group_task_id=group_task_id,
-                        assigned_to=executor,
-                        assigned_by=assigned_by,
-                        status="active",
-                        created_at=now,
-                        completed_at="",
-                    )
-                )
-            conn.commit()
-            return tasks
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to create task group")
-            raise
-        finally:
-            conn.close()
+                group_task_id = cursor.lastrowid
+
+                tasks = self._insert_executors(cursor, group_task_id, assigned_to, assigned_by, now)
+                conn.commit()
+                return tasks
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to create task group")
+                raise
 
+    @retry_write
     def add_executors_to_group(
         self, group_task_id: int, assigned_to: List[str], assigned_by: str
     ) -> List[Task]:
-        conn = get_connection()
-        cursor = conn.cursor()
-        now = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
-        try:
-            cursor.execute("SELECT 1 FROM task_groups WHERE group_task_id = ?", (group_task_id,))
-            if cursor.fetchone() is None:
-                raise ValueError(f"Task group {group_task_id} does not exist")
+        with connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.now().isoformat(timespec="seconds")
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                cursor.execute(SQL_TASK_GROUP_EXISTS, (group_task_id,))
+                if cursor.fetchone() is None:
+                    raise ValueError(f"Task group {group_task_id} does not exist")
+
+                tasks = self._insert_executors(cursor, group_task_id, assigned_to, assigned_by, now)
+                conn.commit()
+                return tasks
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to add executors to group %s", group_task_id)
+                raise
+
+    @staticmethod
+    def _task_filters(
+        assigned_to: Optional[str] = None,
+        status: Optional[str] = None,
+        filter_key: Optional[str] = None,
+        group_id: Optional[str] = None,
+    ) -> Tuple[str, list]:
+        conditions = []
+        params: list = []
+        if assigned_to is not None:
+            # The bot stores "@handle" but the web UI assigns users as typed,
+            # so match the handle with and without the "@".
+            bare = assigned_to.lstrip("@")
+            conditions.append("t.assigned_to IN (?, ?)")
+            params.extend([f"@{bare}", bare])
+        if status is not None:
+            conditions.append("t.status = ?")
+            params.append(status)
+        if group_id is not None:
+            conditions.append("tg.group_id = ?")
+            params.append(group_id)
+        if filter_key in {"active", "completed"}:
+            conditions.append("t.status = ?")
+            params.append(filter_key)
+        elif filter_key == "overdue":
+            conditions.append(f"t.status != 'completed' AND {DEADLINE_DATE_SQL} < ?")
+            params.append(date.today().isoformat())
+        elif filter_key in DEADLINE_FILTER_DAYS:
+            first, last = DEADLINE_FILTER_DAYS[filter_key]
+            today = date.today()
+            conditions.append(f"{DEADLINE_DATE_SQL} BETWEEN ? AND ?")
+            params.append((today + timedelta(days=first)).isoformat())
+            params.append((today + timedelta(days=last)).isoformat())
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        return where, params
+
+    def get_all_tasks(
+        self,
+        assigned_to: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        filter_key: Optional[str] = None,
+        group_id: Optional[str] = None,
+    ) -> List[dict]:
+        return list(
+            self.iter_all_tasks(
+                assigned_to=assigned_to,
+                status=status,
+                limit=limit,
+                offset=offset,
+                filter_key=filter_key,
+                group_id=group_id,
+            )
+        )
+
+    def iter_all_tasks(
+        self,
+        assigned_to: Optional[str] = None,
+        status: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        filter_key: Optional[str] = None,
+        group_id: Optional[str] = None,
+    ) -> Iterator[dict]:
+        """Yield task rows lazily; a read connection is held until the generator finishes or is closed."""
+        where, params = self._task_filters(assigned_to, status, filter_key, group_id)
+        limit_clause = ""
+        if limit is not None or offset:
+            limit_clause = "LIMIT ? OFFSET ?"
+            params.extend([limit if limit is not None else -1, offset])
 
-            tasks: List[Task] = []
-            for executor in assigned_to:
+        with connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            try:
                 cursor.execute(
-                    """
-                    INSERT INTO tasks (
-                        group_task_id, assigned_to, assigned_by, status, created_at, completed_at
-                    ) VALUES (?, ?, ?, ?, ?, ?)
+                    f"""
+                    SELECT
+                        t.id,
+                        t.group_task_id,
+                        tg.task_text,
+                        tg.deadline,
+                        tg.group_id,
+                        t.assigned_to,
+                        t.assigned_by,
+                        t.status,
+                        t.created_at,
+                        t.completed_at
+                    FROM tasks t
+                    JOIN task_groups tg ON t.group_task_id = tg.group_task_id
+                    {where}
+                    ORDER BY t.id
+                    {limit_clause}
                     """,
-                    (group_task_id, executor, assigned_by, "active", now, ""),
-                )
-                task_id = cursor.lastrowid
-                tasks.append(
-                    Task(
-                        id=task_id,
-                        group_task_id=group_task_id,
-                        assigned_to=executor,
-                        assigned_by=assigned_by,
-                        status="active",
-                        created_at=now,
-                        completed_at="",
-                    )
+                    params,
                 )
-            conn.commit()
-            return tasks
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to add executors to group %s", group_task_id)
-            raise
-        finally:
-            conn.close()
+                for row in cursor:
+                    yield dict(zip(TASK_LIST_KEYS, row))
+            except Exception:
+                logging.exception("Failed to fetch all tasks")
+                raise
 
-    def get_all_tasks(self) -> List[dict]:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                """
-                SELECT
-                    t.id,
-                    t.group_task_id,
-                    tg.task_text,
-                    tg.deadline,
-                    tg.group_id,
-                    t.assigned_to,
-                    t.assigned_by,
-                    t.status,
-                    t.created_at,
-                    t.completed_at
-                FROM tasks t
-                JOIN task_groups tg ON t.group_task_id = tg.group_task_id
-                """
-            )
-            rows = cursor.fetchall()
-            return [
-                {
-                    "id": row[0],
-                    "group_task_id": row[1],
-                    "task_text": row[2],
-                    "deadline": row[3],
-                    "group_id": row[4],
-                    "assigned_to": row[5],
-                    "assigned_by": row[6],
-                    "status": row[7],
-                    "created_at": row[8],
-                    "completed_at": row[9],
-                }
-                for row in rows
-            ]
-        except Exception:
-            logging.exception("Failed to fetch all tasks")
-            raise
-        finally:
-            conn.close()
+    def count_tasks(
+        self,
+        assigned_to: Optional[str] = None,
+        status: Optional[str] = None,
+        filter_key: Optional[str] = None,
+        group_id: Optional[str] = None,
+    ) -> int:
+        where, params = self._task_filters(assigned_to, status, filter_key, group_id)
+        with connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"""
+                    SELECT COUNT(*)
+                    FROM tasks t
+                    JOIN task_groups tg ON t.group_task_id = tg.group_task_id
+                    {where}
+                    """,
+                    params,
+                )
+                return cursor.fetchone()[0]
+            except Exception:
+                logging.exception("Failed to count tasks")
+                raise
 
     def get_tasks_by_group(self, group_task_id: int) -> List[Task]:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                """
-                SELECT id, group_task_id, assigned_to, assigned_by, status, created_at, completed_at
-                FROM tasks
-                WHERE group_task_id = ?
-                """,
-                (group_task_id,),
-            )
-            rows = cursor.fetchall()
-            return [self._row_to_task(row) for row in rows]
-        except Exception:
-            logging.exception("Failed to fetch tasks for group %s", group_task_id)
-            raise
-        finally:
-            conn.close()
+        with connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(SQL_GET_TASKS_BY_GROUP, (group_task_id,))
+                return [self._row_to_task(row) for row in cursor]
+            except Exception:
+                logging.exception("Failed to fetch tasks for group %s", group_task_id)
+                raise
 
     def get_task_by_id(self, task_id: int) -> Optional[Task]:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                """
-                SELECT id, group_task_id, assigned_to, assigned_by, status, created_at, completed_at
-                FROM tasks
-                WHERE id = ?
-                """,
-                (task_id,),
-            )
-            row = cursor.fetchone()
-            return self._row_to_task(row) if row else None
-        except Exception:
-            logging.exception("Failed to fetch task with id %s", task_id)
-            raise
-        finally:
-            conn.close()
+        with connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(SQL_GET_TASK_BY_ID, (task_id,))
+                row = cursor.fetchone()
+                return self._row_to_task(row) if row else None
+            except Exception:
+                logging.exception("Failed to fetch task with id %s", task_id)
+                raise
 
+    @retry_write
     def update_group(self, group_task_id: int, task_group_update: TaskGroupUpdate) -> TaskGroup:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            fields = []
-            values = []
-            if task_group_update.task_text is not None:
-                fields.append("task_text = ?")
-                values.append(task_group_update.task_text)
-            if task_group_update.deadline is not None:
-                fields.append("deadline = ?")
-                values.append(task_group_update.deadline)
-            if task_group_update.group_id is not None:
-                fields.append("group_id = ?")
-                values.append(task_group_update.group_id)
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                fields = []
+                values = []
+                if task_group_update.task_text is not None:
+                    fields.append("task_text = ?")
+                    values.append(task_group_update.task_text)
+                if task_group_update.deadline is not None:
+                    fields.append("deadline = ?")
+                    values.append(normalize_deadline(task_group_update.deadline))
+                if task_group_update.group_id is not None:
+                    fields.append("group_id = ?")
+                    values.append(task_group_update.group_id)
 
-            if fields:
-                values.append(group_task_id)
-                cursor.execute(
-                    f"UPDATE task_groups SET {', '.join(fields)} WHERE group_task_id = ?",
-                    tuple(values),
-                )
-                if cursor.rowcount == 0:
+                columns = "group_task_id, task_text, deadline, group_id, created_at"
+                if fields:
+                    values.append(group_task_id)
+                    cursor.execute(
+                        f"UPDATE task_groups SET {', '.join(fields)} WHERE group_task_id = ? "
+                        f"RETURNING {columns}",
+                        tuple(values),
+                    )
+                    row = cursor.fetchone()
+                    conn.commit()
+                else:
+                    cursor.execute(
+                        f"SELECT {columns} FROM task_groups WHERE group_task_id = ?", (group_task_id,)
+                    )
+                    row = cursor.fetchone()
+                if row is None:
                     raise ValueError(f"Task group {group_task_id} does not exist")
-                conn.commit()
-
-            cursor.execute(
-                """
-                SELECT group_task_id, task_text, deadline, group_id, created_at
-                FROM task_groups
-                WHERE group_task_id = ?
-                """,
-                (group_task_id,),
-            )
-            row = cursor.fetchone()
-            if row is None:
-                raise ValueError(f"Task group {group_task_id} does not exist")
-            return TaskGroup(
-                group_task_id=row[0],
-                task_text=row[1],
-                deadline=row[2],
-                group_id=row[3],
-                created_at=row[4],
-            )
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to update group %s", group_task_id)
-            raise
-        finally:
-            conn.close()
+                return TaskGroup.model_construct(
+                    group_task_id=row[0],
+                    task_text=row[1],
+                    deadline=row[2],
+                    group_id=row[3],
+                    created_at=row[4],
+                )
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to update group %s", group_task_id)
+                raise
 
+    @retry_write
     def update_task_status(self, task_id: int, new_status: str) -> Task:
-        conn = get_connection()
-        cursor = conn.cursor()
-        now = datetime.now().strftime("%d.%m.%Y %H:%M:%S")
-        completed_at = now if new_status == "completed" else ""
-        try:
-            cursor.execute(
-                """
-                UPDATE tasks
-                SET status = ?, completed_at = ?
-                WHERE id = ?
-                """,
-                (new_status, completed_at, task_id),
-            )
-            if cursor.rowcount == 0:
-                raise ValueError(f"Task {task_id} does not exist")
-            conn.commit()
-            updated_task = self.get_task_by_id(task_id)
-            if updated_task is None:
-                raise ValueError(f"Task {task_id} does not exist")
-            return updated_task
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to update status for task %s", task_id)
-            raise
-        finally:
-            conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.now().isoformat(timespec="seconds")
+            completed_at = now if new_status == "completed" else ""
+            try:
+                cursor.execute(SQL_UPDATE_TASK_STATUS, (new_status, completed_at, task_id))
+                row = cursor.fetchone()
+                if row is None:
+                    raise ValueError(f"Task {task_id} does not exist")
+                conn.commit()
+                return self._row_to_task(row)
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to update status for task %s", task_id)
+                raise
 
+    @retry_write
     def delete_task(self, task_id: int) -> int:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT group_task_id FROM tasks WHERE id = ?", (task_id,))
-            row = cursor.fetchone()
-            if row is None:
-                raise ValueError(f"Task {task_id} does not exist")
-            group_task_id = row[0]
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(SQL_TASK_GROUP_OF, (task_id,))
+                row = cursor.fetchone()
+                if row is None:
+                    raise ValueError(f"Task {task_id} does not exist")
+                group_task_id = row[0]
 
-            cursor.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
-            conn.commit()
+                cursor.execute(SQL_DELETE_TASK, (task_id,))
+                conn.commit()
 
-            cursor.execute(
-                "SELECT COUNT(*) FROM tasks WHERE group_task_id = ?", (group_task_id,)
-            )
-            remaining = cursor.fetchone()[0]
-            return remaining
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to delete task %s", task_id)
-            raise
-        finally:
-            conn.close()
+                cursor.execute(SQL_COUNT_GROUP_TASKS, (group_task_id,))
+                remaining = cursor.fetchone()[0]
+                return remaining
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to delete task %s", task_id)
+                raise
 
     @staticmethod
-    def _row_to_task(row: sqlite3.Row) -> Task:
-        return Task(
-            id=row[0],
-            group_task_id=row[1],
-            assigned_to=row[2],
-            assigned_by=row[3],
-            status=row[4],
-            created_at=row[5],
-            completed_at=row[6],
+    def _row_to_task(row: Tuple) -> Task:
+        # Rows come from our own table, so skip pydantic validation.
+        task_id, group_task_id, assigned_to, assigned_by, status, created_at, completed_at = row
+        return Task.model_construct(
+            id=task_id,
+            group_task_id=group_task_id,
+            assigned_to=assigned_to,
+            assigned_by=assigned_by,
+            status=status,
+            created_at=created_at,
+            completed_at=completed_at,
         )
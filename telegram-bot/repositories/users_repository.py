@@ -1,98 +1,108 @@
 import logging
 import sqlite3
+from collections import defaultdict
 from typing import List
 
-from db.database import get_connection
+from db.database import connection, retry_write
 from models import User
 
 
 class UsersRepository:
     def get_all_users(self) -> List[User]:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
+        with connection(readonly=True) as conn:
+            cursor = conn.cursor()
+            try:
+                # One read transaction so both queries see the same snapshot.
+                conn.execute("BEGIN")
+                cursor.execute("SELECT username, full_name FROM users ORDER BY username")
+                users = cursor.fetchall()
+                groups_by_user: dict[str, List[str]] = defaultdict(list)
+                cursor.execute("SELECT username, group_id FROM user_groups")
+                for username, group_id in cursor:
+                    groups_by_user[username].append(group_id)
+                return [
+                    User.model_construct(
+                        username=username, full_name=full_name, groups=groups_by_user.get(username, [])
+                    )
+                    for username, full_name in users
+                ]
+            except Exception:
+                logging.exception("Failed to fetch users")
+                raise
+
+    @staticmethod
+    def _replace_groups(cursor: sqlite3.Cursor, username: str, groups: List[str]) -> None:
+        """Make the user's memberships equal to groups, touching only rows that change."""
+        cursor.execute("SELECT group_id FROM user_groups WHERE username = ?", (username,))
+        existing = {group_id for (group_id,) in cursor}
+        wanted = set(groups)
+        to_remove = existing - wanted
+        if to_remove:
+            placeholders = ", ".join("?" * len(to_remove))
             cursor.execute(
-                """
-                SELECT u.username, u.full_name, ug.group_id
-                FROM users u
-                LEFT JOIN user_groups ug ON u.username = ug.username
-                ORDER BY u.username
-                """
+                f"DELETE FROM user_groups WHERE username = ? AND group_id IN ({placeholders})",
+                (username, *to_remove),
+            )
+        to_add = wanted - existing
+        if to_add:
+            cursor.executemany(
+                "INSERT INTO user_groups (username, group_id) VALUES (?, ?)",
+                [(username, group_id) for group_id in to_add],
             )
-            users_map: dict[str, User] = {}
-            for username, full_name, group_id in cursor.fetchall():
-                if username not in users_map:
-                    users_map[username] = User(username=username, full_name=full_name, groups=[])
-                if group_id:
-                    users_map[username].groups.append(group_id)
-            return list(users_map.values())
-        except Exception:
-            logging.exception("Failed to fetch users")
-            raise
-        finally:
-            conn.close()
 
+    @retry_write
     def upsert_user(self, username: str, full_name: str | None, groups: List[str]) -> User:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute(
-                "INSERT OR REPLACE INTO users (username, full_name) VALUES (?, ?)",
-                (username, full_name),
-            )
-            cursor.execute("DELETE FROM user_groups WHERE username = ?", (username,))
-            for group_id in groups:
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.execute("BEGIN")
+                # An in-place upsert: INSERT OR REPLACE would delete the row and
+                # cascade away the user's memberships before the diff below.
                 cursor.execute(
-                    "INSERT INTO user_groups (username, group_id) VALUES (?, ?)",
-                    (username, group_id),
+                    "INSERT INTO users (username, full_name) VALUES (?, ?) "
+                    "ON CONFLICT (username) DO UPDATE SET full_name = excluded.full_name",
+                    (username, full_name),
                 )
-            conn.commit()
-            return User(username=username, full_name=full_name, groups=groups)
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to upsert user %s", username)
-            raise
-        finally:
-            conn.close()
+                self._replace_groups(cursor, username, groups)
+                conn.commit()
+                return User(username=username, full_name=full_name, groups=groups)
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to upsert user %s", username)
+                raise
 
+    @retry_write
     def update_user(self, username: str, full_name: str | None, groups: List[str]) -> User:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
-            if cursor.fetchone() is None:
-                raise ValueError(f"User {username} does not exist")
-            cursor.execute(
-                "UPDATE users SET full_name = ? WHERE username = ?",
-                (full_name, username),
-            )
-            cursor.execute("DELETE FROM user_groups WHERE username = ?", (username,))
-            for group_id in groups:
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                conn.execute("BEGIN")
+                cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+                if cursor.fetchone() is None:
+                    raise ValueError(f"User {username} does not exist")
                 cursor.execute(
-                    "INSERT INTO user_groups (username, group_id) VALUES (?, ?)",
-                    (username, group_id),
+                    "UPDATE users SET full_name = ? WHERE username = ?",
+                    (full_name, username),
                 )
-            conn.commit()
-            return User(username=username, full_name=full_name, groups=groups)
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to update user %s", username)
-            raise
-        finally:
-            conn.close()
+                self._replace_groups(cursor, username, groups)
+                conn.commit()
+                return User(username=username, full_name=full_name, groups=groups)
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to update user %s", username)
+                raise
 
+    @retry_write
     def delete_user(self, username: str) -> None:
-        conn = get_connection()
-        cursor = conn.cursor()
-        try:
-            cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
-            if cursor.fetchone() is None:
-                raise ValueError(f"User {username} does not exist")
-            cursor.execute("DELETE FROM users WHERE username = ?", (username,))
-            conn.commit()
-        except Exception:
-            conn.rollback()
-            logging.exception("Failed to delete user %s", username)
-            raise
-        finally:
-            conn.close()
+        with connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SELECT 1 FROM users WHERE username = ?", (username,))
+                if cursor.fetchone() is None:
+                    raise ValueError(f"User {username} does not exist")
+                cursor.execute("DELETE FROM users WHERE username = ?", (username,))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                logging.exception("Failed to delete user %s", username)
+                raise